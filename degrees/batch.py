@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import sys
+import time
+
+from graph import load_graph
+from landmarks import load_index
+
+# Graph and landmark index shared by every query answered in this process
+graph = None
+index = None
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python batch.py directory [queries.jsonl]")
+    directory = sys.argv[1]
+
+    # Load once up front so the snapshot and landmark index exist
+    # before workers read them
+    print("Loading data...", file=sys.stderr)
+    load_index(directory, load_graph(directory))
+    print("Data loaded.", file=sys.stderr)
+
+    queries = open(sys.argv[2], encoding="utf-8") if len(sys.argv) == 3 else sys.stdin
+    latencies = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(initializer=init_worker, initargs=(directory,)) as pool:
+        for result in pool.imap(answer, queries, chunksize=64):
+            if result is None:
+                continue
+            latencies.append(result["latency_ms"])
+            print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - start
+
+    if latencies:
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+        print(f"{len(latencies)} queries in {elapsed:.2f}s, "
+              f"p50 {p50:.2f}ms, p99 {p99:.2f}ms", file=sys.stderr)
+
+
+def init_worker(directory):
+    """
+    Memory-map the graph snapshot and landmark index in a worker
+    process, so every worker shares the same read-only pages.
+    """
+    global graph, index
+    graph = load_graph(directory)
+    index = load_index(directory, graph)
+
+
+def answer(line):
+    """
+    Answer one JSON line query of the form
+    {"source": name, "target": name}, where "source_id" and
+    "target_id" may be given instead to pick between people
+    sharing a name, or of the form [source name, target name].
+
+    Returns a dictionary describing the result, or None for blank lines.
+    """
+    if not line.strip():
+        return None
+    start = time.perf_counter()
+    result = {}
+    try:
+        query = json.loads(line)
+        if isinstance(query, list) and len(query) == 2:
+            query = {"source": query[0], "target": query[1]}
+        if not isinstance(query, dict):
+            raise ValueError("query must be an object or a [source, target] pair")
+        result["source"] = query.get("source", query.get("source_id"))
+        result["target"] = query.get("target", query.get("target_id"))
+        source = resolve(query, "source")
+        target = resolve(query, "target")
+        source = graph.person_index[source]
+        target = graph.person_index[target]
+
+        # Landmarks only rule out unconnected pairs, which the
+        # bidirectional search would otherwise explore a whole
+        # component to find
+        if index.lower_bound(source, target) is None:
+            path = None
+        else:
+            path = graph.index_path(source, target)
+        if path is None:
+            result["degrees"] = None
+            result["path"] = None
+        else:
+            result["degrees"] = len(path)
+            result["path"] = [
+                {"movie": graph.movie_titles[movie], "person": graph.person_names[person]}
+                for movie, person in path
+            ]
+    except (ValueError, KeyError) as e:
+        result["error"] = str(e)
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def resolve(query, field):
+    """
+    Returns the person ID for the `field` end of a query.
+    """
+    person_id = query.get(f"{field}_id")
+    if person_id is not None:
+        if not isinstance(person_id, str) or person_id not in graph.person_index:
+            raise ValueError(f"unknown person id {person_id}")
+        return person_id
+    if field not in query:
+        raise ValueError(f"missing {field}")
+    if not isinstance(query[field], str):
+        raise ValueError(f"{field} must be a name")
+    person_ids = graph.person_ids_for_name(query[field])
+    if len(person_ids) == 0:
+        raise ValueError(f"person not found: {query[field]}")
+    elif len(person_ids) > 1:
+        raise ValueError(f"ambiguous name {query[field]}, ids: {', '.join(person_ids)}")
+    return person_ids[0]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+import graph
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -57,31 +58,21 @@ def main():
         sys.exit("Usage: python degrees.py [directory]")
     directory = sys.argv[1] if len(sys.argv) == 2 else "large"
 
-    # Load data from files into memory
+    # Load the graph snapshot, only parsing the CSV files when they changed
     print("Loading data...")
-    load_data(directory)
+    costars = graph.load_graph(directory)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = graph.person_id_for_name(costars, input("Name: "))
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = graph.person_id_for_name(costars, input("Name: "))
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
-
-    if path is None:
-        print("Not connected.")
-    else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+    source = costars.person_index[source]
+    target = costars.person_index[target]
+    graph.print_path(costars, source, costars.index_path(source, target))
 
 
 def shortest_path(source, target):
@@ -94,7 +85,7 @@ def shortest_path(source, target):
 
     # Initialize frontier to initial position
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(start)
 
     # Empty explored set
@@ -130,6 +121,86 @@ def shortest_path(source, target):
         explored.add(node.state)
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both ends at once until the two searches meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to (movie_id, person_id) step towards each end
+    forward = {source: None}
+    backward = {target: None}
+
+    # Distances from each end, used to pick the best meeting point
+    forward_distance = {source: 0}
+    backward_distance = {target: 0}
+
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Always expand the smaller frontier by one whole level
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, parents, distance = forward_frontier, forward, forward_distance
+            other_distance = backward_distance
+        else:
+            frontier, parents, distance = backward_frontier, backward, backward_distance
+            other_distance = forward_distance
+
+        next_frontier = []
+        meeting = None
+        best = None
+        for person_id in frontier:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                distance[neighbor] = distance[person_id] + 1
+                next_frontier.append(neighbor)
+
+                # Searches met, keep the shortest join found on this level
+                if neighbor in other_distance:
+                    length = distance[neighbor] + other_distance[neighbor]
+                    if best is None or length < best:
+                        meeting, best = neighbor, length
+
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+
+        if frontier is forward_frontier:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path through `meeting`
+    given the parent maps of a bidirectional search.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
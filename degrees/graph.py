@@ -0,0 +1,643 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# Binary snapshot format, bump the version whenever the layout or
+# what is stored for the same CSV files changes
+SNAPSHOT = "graph.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\0"
+SNAPSHOT_VERSION = 2
+
+STRING_COLUMNS = [
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years"
+]
+ARRAY_COLUMNS = [
+    "person_offsets", "person_movies", "movie_offsets", "movie_people"
+]
+
+
+class CoStarGraph():
+    """
+    Bipartite graph of people and the movies they starred in.
+
+    Person and movie IDs are interned to dense integers and the
+    adjacency is stored as CSR arrays: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the
+    stars of movie `m` are `movie_people[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Lookup tables are only built when first needed
+        self._person_index = None
+        self._names = None
+
+        # Counts of CSV rows skipped while loading, if known
+        self.dropped = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Stream the stars, people and movies CSV files from `directory`.
+
+        stars.csv is read first so that only people and movies with at
+        least one starring role are kept, and only the columns the graph
+        needs are read from each file. Counts of rows that were dropped
+        are kept in `dropped`.
+        """
+        dropped = {"people": 0, "movies": 0, "stars": 0}
+
+        # Intern IDs to dense integers in order of first appearance
+        person_index, movie_index = {}, {}
+        stars_people, stars_movies = array("i"), array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+            for person_id, movie_id in project(f, ["person_id", "movie_id"], dropped, "stars"):
+                stars_people.append(person_index.setdefault(person_id, len(person_index)))
+                stars_movies.append(movie_index.setdefault(movie_id, len(movie_index)))
+
+        person_names = [None] * len(person_index)
+        person_births = [None] * len(person_index)
+        with open(f"{directory}/people.csv", encoding="utf-8", newline="") as f:
+            for person_id, name, birth in project(f, ["id", "name", "birth"], dropped, "people"):
+                i = person_index.get(person_id)
+                if i is None:
+                    dropped["people"] += 1
+                    continue
+                person_names[i] = name
+                person_births[i] = birth
+
+        movie_titles = [None] * len(movie_index)
+        movie_years = [None] * len(movie_index)
+        with open(f"{directory}/movies.csv", encoding="utf-8", newline="") as f:
+            for movie_id, title, year in project(f, ["id", "title", "year"], dropped, "movies"):
+                i = movie_index.get(movie_id)
+                if i is None:
+                    dropped["movies"] += 1
+                    continue
+                movie_titles[i] = title
+                movie_years[i] = year
+
+        # Drop starring roles for people or movies missing from their files
+        person_ids, person_remap = compact(person_index, person_names, person_births)
+        movie_ids, movie_remap = compact(movie_index, movie_titles, movie_years)
+        edges_people, edges_movies = array("i"), array("i")
+        for person, movie in zip(stars_people, stars_movies):
+            person, movie = person_remap[person], movie_remap[movie]
+            if person == -1 or movie == -1:
+                dropped["stars"] += 1
+                continue
+            edges_people.append(person)
+            edges_movies.append(movie)
+        del stars_people, stars_movies
+
+        person_offsets, person_movies = csr(edges_people, edges_movies, len(person_ids))
+        movie_offsets, movie_people = csr(edges_movies, edges_people, len(movie_ids))
+        graph = cls(person_ids, person_names, person_births,
+                    movie_ids, movie_titles, movie_years,
+                    person_offsets, person_movies, movie_offsets, movie_people)
+        graph.dropped = dropped
+        return graph
+
+    @classmethod
+    def from_snapshot(cls, filename, key=None):
+        """
+        Memory-map a binary snapshot written by `save`.
+
+        Returns None if the snapshot was written by another format
+        version or platform, or for a different `key`.
+        """
+        with open(filename, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start = len(SNAPSHOT_MAGIC) + 8
+        (length,) = struct.unpack("<Q", buffer[len(SNAPSHOT_MAGIC):start])
+        header = json.loads(buffer[start:start + length])
+        if (header["version"] != SNAPSHOT_VERSION
+                or header["byteorder"] != sys.byteorder
+                or (key is not None and header["key"] != key)):
+            # Unmap before the caller replaces the file
+            buffer.close()
+            return None
+
+        # Views into the mapped file, nothing is copied
+        view = memoryview(buffer)[start + length:]
+        sections = {
+            name: view[offset:offset + size].cast(typecode)
+            for name, (typecode, offset, size) in header["sections"].items()
+        }
+        columns = {
+            name: StringColumn(sections[f"{name}.offsets"], sections[f"{name}.blob"])
+            for name in STRING_COLUMNS
+        }
+        columns.update({name: sections[name] for name in ARRAY_COLUMNS})
+        graph = cls(**columns)
+        graph.dropped = header["dropped"]
+        return graph
+
+    def save(self, filename, key):
+        """
+        Write the graph to a binary snapshot at `filename`, tagged
+        with `key` so that stale snapshots can be detected on load.
+        """
+        sections = []
+        for name in STRING_COLUMNS:
+            offsets, blob = pack_strings(getattr(self, name))
+            sections.append((f"{name}.offsets", "q", offsets))
+            sections.append((f"{name}.blob", "B", blob))
+        for name in ARRAY_COLUMNS:
+            column = getattr(self, name)
+            typecode = column.format if isinstance(column, memoryview) else column.typecode
+            sections.append((name, typecode, column.tobytes()))
+
+        # Lay sections out on 8 byte boundaries after the header
+        layout = {}
+        offset = 0
+        for name, typecode, data in sections:
+            layout[name] = (typecode, offset, len(data))
+            offset += len(data) + padding(len(data))
+        header = json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "byteorder": sys.byteorder,
+            "key": key,
+            "dropped": self.dropped,
+            "sections": layout
+        }).encode("utf-8")
+        header += b" " * padding(len(header))
+
+        # Write to a temporary file first so readers never see a partial snapshot
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, typecode, data in sections:
+                f.write(data)
+                f.write(bytes(padding(len(data))))
+        os.replace(temporary, filename)
+
+    @property
+    def person_index(self):
+        """Maps person IDs to their integer index."""
+        if self._person_index is None:
+            self._person_index = {
+                person_id: i for i, person_id in enumerate(self.person_ids)
+            }
+        return self._person_index
+
+    @property
+    def names(self):
+        """Maps lowercase names to a list of integer person indices."""
+        if self._names is None:
+            self._names = {}
+            for i, name in enumerate(self.person_names):
+                self._names.setdefault(name.lower(), []).append(i)
+        return self._names
+
+    def movies_of(self, person):
+        """
+        Returns the integer movie indices a person starred in.
+        """
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def stars_of(self, movie):
+        """
+        Returns the integer person indices that starred in a movie.
+        """
+        return self.movie_people[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the IMDB ids of every person with a given name.
+        """
+        return [self.person_ids[i] for i in self.names.get(name.lower(), [])]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target person IDs.
+
+        If no possible path, returns None.
+        """
+        path = self.index_path(
+            self.person_index[source], self.person_index[target]
+        )
+        if path is None:
+            return None
+        return [
+            (self.movie_ids[movie], self.person_ids[person])
+            for movie, person in path
+        ]
+
+    def index_path(self, source, target):
+        """
+        Bidirectional breadth-first search between two integer person
+        indices, returning a list of (movie, person) index pairs.
+
+        Each movie is expanded at most once per side, since all of its
+        stars are reached at the same depth.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return []
+
+        # Maps person index to (movie, person) step towards each end
+        forward, backward = {source: None}, {target: None}
+        forward_distance, backward_distance = {source: 0}, {target: 0}
+        forward_movies, backward_movies = set(), set()
+        forward_frontier, backward_frontier = [source], [target]
+
+        while forward_frontier and backward_frontier:
+
+            # Always expand the smaller frontier by one whole level
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, parents, distance, seen = (
+                    forward_frontier, forward, forward_distance, forward_movies
+                )
+                other_distance = backward_distance
+            else:
+                frontier, parents, distance, seen = (
+                    backward_frontier, backward, backward_distance, backward_movies
+                )
+                other_distance = forward_distance
+
+            next_frontier = []
+            meeting = None
+            best = None
+            for person in frontier:
+                depth = distance[person] + 1
+                for movie in self.movies_of(person):
+                    if movie in seen:
+                        continue
+                    seen.add(movie)
+                    for neighbor in self.stars_of(movie):
+                        if neighbor in parents:
+                            continue
+                        parents[neighbor] = (movie, person)
+                        distance[neighbor] = depth
+                        next_frontier.append(neighbor)
+
+                        # Searches met, keep the shortest join on this level
+                        if neighbor in other_distance:
+                            length = depth + other_distance[neighbor]
+                            if best is None or length < best:
+                                meeting, best = neighbor, length
+
+            if meeting is not None:
+                return join_paths(forward, backward, meeting)
+
+            if frontier is forward_frontier:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+        return None
+
+    def distances_from(self, source):
+        """
+        Breadth-first search from a source person ID to every
+        person reachable from them.
+
+        Returns a ShortestPathTree holding distance and parent arrays.
+        """
+        source = self.person_index[source]
+        size = len(self.person_offsets) - 1
+        distance = array("i", [-1]) * size
+        parent_person = array("i", [-1]) * size
+        parent_movie = array("i", [-1]) * size
+        seen = bytearray(len(self.movie_offsets) - 1)
+
+        distance[source] = 0
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    if seen[movie]:
+                        continue
+                    seen[movie] = 1
+                    for neighbor in self.stars_of(movie):
+                        if distance[neighbor] != -1:
+                            continue
+                        distance[neighbor] = depth
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        return ShortestPathTree(self, source, distance, parent_person, parent_movie)
+
+
+class ShortestPathTree():
+    """
+    Result of a single-source breadth-first search over a CoStarGraph.
+
+    `distance[p]` is the degrees of separation of person index `p`
+    from the source, or -1 if unreachable, and `parent_person[p]` and
+    `parent_movie[p]` are the previous step on a shortest path.
+    """
+
+    def __init__(self, graph, source, distance, parent_person, parent_movie):
+        self.graph = graph
+        self.source = source
+        self.distance = distance
+        self.parent_person = parent_person
+        self.parent_movie = parent_movie
+
+    def histogram(self):
+        """
+        Returns a dictionary mapping each distance to the number of
+        people at that distance from the source.
+        """
+        counts = {}
+        for d in self.distance:
+            if d != -1:
+                counts[d] = counts.get(d, 0) + 1
+        return dict(sorted(counts.items()))
+
+    def index_path_to(self, target):
+        """
+        Returns the list of (movie, person) index pairs from the
+        source to a target person index, or None if unreachable.
+        """
+        if self.distance[target] == -1:
+            return None
+        path = []
+        while target != self.source:
+            path.append((self.parent_movie[target], target))
+            target = self.parent_person[target]
+        path.reverse()
+        return path
+
+    def path_to(self, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs from
+        the source to a target person ID, or None if unreachable.
+        """
+        path = self.index_path_to(self.graph.person_index[target])
+        if path is None:
+            return None
+        return [
+            (self.graph.movie_ids[movie], self.graph.person_ids[person])
+            for movie, person in path
+        ]
+
+
+class StringColumn():
+    """
+    Read-only sequence of strings stored as one UTF-8 buffer
+    and an array of offsets into it.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def pack_strings(strings):
+    """
+    Returns (offsets, blob) bytes for a sequence of strings.
+    """
+    offsets = array("q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets.tobytes(), bytes(blob)
+
+
+def padding(size):
+    """
+    Returns the number of bytes needed to pad `size` to a multiple of 8.
+    """
+    return -size % 8
+
+
+def snapshot_key(directory):
+    """
+    Returns the modification times and sizes of the CSV files in
+    `directory`, used to tell whether a snapshot is up to date.
+    """
+    key = {}
+    for name in ["people.csv", "movies.csv", "stars.csv"]:
+        stat = os.stat(os.path.join(directory, name))
+        key[name] = [stat.st_mtime_ns, stat.st_size]
+    return key
+
+
+def load_graph(directory, filename=None):
+    """
+    Load the graph for `directory` from its snapshot if that is up to
+    date with the CSV files, otherwise parse the CSV files and write
+    a fresh snapshot for the next run.
+    """
+    if filename is None:
+        filename = os.path.join(directory, SNAPSHOT)
+    key = snapshot_key(directory)
+
+    if os.path.exists(filename):
+        graph = CoStarGraph.from_snapshot(filename, key)
+        if graph is not None:
+            return graph
+
+    graph = CoStarGraph.from_csv(directory)
+    try:
+        graph.save(filename, key)
+    except OSError:
+        pass
+    return graph
+
+
+def project(f, columns, dropped, kind):
+    """
+    Yields tuples of just the named `columns` from each row of CSV
+    file `f`, counting rows that are too short in `dropped[kind]`.
+    """
+    reader = csv.reader(f)
+    header = next(reader, [])
+    positions = [header.index(column) for column in columns]
+    width = max(positions) + 1
+    for row in reader:
+        if len(row) < width:
+            dropped[kind] += 1
+            continue
+        yield tuple(row[i] for i in positions)
+
+
+def compact(index, *columns):
+    """
+    Removes IDs whose `columns` were never filled in, in place.
+
+    Returns the surviving IDs in index order and an array mapping
+    old indices to new ones, or -1 for removed IDs.
+    """
+    ids = [None] * len(index)
+    for key, i in index.items():
+        ids[i] = key
+    index.clear()
+
+    remap = array("i", [-1]) * len(ids)
+    kept = 0
+    for i in range(len(ids)):
+        if columns[0][i] is None:
+            continue
+        remap[i] = kept
+        ids[kept] = ids[i]
+        for column in columns:
+            column[kept] = column[i]
+        kept += 1
+    del ids[kept:]
+    for column in columns:
+        del column[kept:]
+    return ids, remap
+
+
+def csr(rows, cols, size):
+    """
+    Builds CSR (offsets, indices) arrays for `size` rows from
+    parallel arrays of row and column indices.
+    """
+    offsets = array("q", bytes(8 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("i", bytes(4 * len(cols)))
+    position = array("q", offsets[:-1])
+    for row, col in zip(rows, cols):
+        indices[position[row]] = col
+        position[row] += 1
+    return offsets, indices
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie, person) path through `meeting`
+    given the parent maps of a bidirectional search.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, parent = forward[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, person = backward[person]
+        path.append((movie, person))
+    return path
+
+
+def person_id_for_name(graph, name):
+    """
+    Returns the IMDB id for a person's name,
+    resolving ambiguities as needed.
+    """
+    person_ids = graph.person_ids_for_name(name)
+    if len(person_ids) == 0:
+        return None
+    elif len(person_ids) > 1:
+        print(f"Which '{name}'?")
+        for person_id in person_ids:
+            i = graph.person_index[person_id]
+            name = graph.person_names[i]
+            birth = graph.person_births[i]
+            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+        try:
+            person_id = input("Intended Person ID: ")
+            if person_id in person_ids:
+                return person_id
+        except ValueError:
+            pass
+        return None
+    else:
+        return person_ids[0]
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python graph.py [directory]")
+    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+
+    # Load data from files into memory
+    print("Loading data...")
+    graph = load_graph(directory)
+    print("Data loaded.")
+    if graph.dropped is not None:
+        print("Dropped rows: " + ", ".join(
+            f"{count} {kind}" for kind, count in graph.dropped.items()
+        ))
+
+    source = person_id_for_name(graph, input("Name: "))
+    if source is None:
+        sys.exit("Person not found.")
+    target = person_id_for_name(graph, input("Name: "))
+    if target is None:
+        sys.exit("Person not found.")
+
+    # Search over integer indices, only mapping back to names for display
+    source = graph.person_index[source]
+    target = graph.person_index[target]
+    print_path(graph, source, graph.index_path(source, target))
+
+
+def print_path(graph, source, path):
+    """
+    Print a path of (movie, person) index pairs from person index
+    `source`, or that there is none.
+    """
+    if path is None:
+        print("Not connected.")
+    else:
+        degrees = len(path)
+        print(f"{degrees} degrees of separation.")
+        path = [(None, source)] + path
+        for i in range(degrees):
+            person1 = graph.person_names[path[i][1]]
+            person2 = graph.person_names[path[i + 1][1]]
+            movie = graph.movie_titles[path[i + 1][0]]
+            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+if __name__ == "__main__":
+    main()
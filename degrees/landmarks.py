@@ -0,0 +1,346 @@
+import csv
+import heapq
+import io
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from collections import deque
+
+from graph import SNAPSHOT_VERSION, load_graph, person_id_for_name, print_path, snapshot_key
+
+# Landmark index format, bump the version whenever the layout changes
+INDEX = "landmarks.index"
+INDEX_VERSION = 2
+
+# Number of landmarks to pick by default
+LANDMARKS = 16
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few well connected landmark people
+    to everyone else in a CoStarGraph.
+
+    By the triangle inequality, |d(L, a) - d(L, b)| never overestimates
+    d(a, b) for any landmark L, which gives an admissible A* heuristic.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=LANDMARKS):
+        """
+        Pick the `k` people with the most co-star links as landmarks
+        and run a breadth-first search from each of them.
+        """
+        degree = []
+        for person in range(len(graph.person_offsets) - 1):
+            total = 0
+            for movie in graph.movies_of(person):
+                total += graph.movie_offsets[movie + 1] - graph.movie_offsets[movie]
+            degree.append(total)
+        landmarks = heapq.nlargest(k, range(len(degree)), key=degree.__getitem__)
+
+        distances = [
+            graph.distances_from(graph.person_ids[landmark]).distance
+            for landmark in landmarks
+        ]
+        return cls(graph, landmarks, distances)
+
+    @classmethod
+    def load(cls, graph, filename):
+        """
+        Memory-map an index written by `save`, returning it with its key.
+
+        Returns None, None if the index was written by another format
+        version or platform, or for a graph of another snapshot version
+        or size.
+        """
+        with open(filename, "rb") as f:
+            line = f.readline()
+            header = json.loads(line)
+            if (header["version"] != INDEX_VERSION
+                    or header["byteorder"] != sys.byteorder
+                    or header["key"]["snapshot"] != SNAPSHOT_VERSION
+                    or header["key"]["size"] != graph_size(graph)):
+                return None, None
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Views into the mapped file, so worker processes share one copy
+        size = header["key"]["size"][0]
+        view = memoryview(buffer)[len(line):].cast("i")
+        distances = [
+            view[i * size:(i + 1) * size] for i in range(len(header["landmarks"]))
+        ]
+        return cls(graph, header["landmarks"], distances), header["key"]
+
+    def save(self, filename, key):
+        """
+        Write the index to `filename`, tagged with `key` so that
+        changes to the data can be detected on load.
+        """
+        header = json.dumps({
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "key": key,
+            "landmarks": self.landmarks
+        }).encode("utf-8")
+
+        # Pad the header line so the distances start on an 8 byte boundary
+        header += b" " * (-(len(header) + 1) % 8) + b"\n"
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(header)
+            for distance in self.distances:
+                f.write(distance)
+        os.replace(temporary, filename)
+
+    def add_edges(self, edges):
+        """
+        Update distances after (person, movie) index edges have been
+        added to the graph.
+
+        New edges can only shorten distances, so each landmark only
+        relaxes outwards from the movies that gained stars. Distances
+        mapped by `load` are copied first, since they are read-only.
+        """
+        self.distances = [array("i", distance) for distance in self.distances]
+        movies = {movie for person, movie in edges}
+        for distance in self.distances:
+            queue = deque()
+            for movie in movies:
+                reached = [distance[p] for p in self.graph.stars_of(movie) if distance[p] != -1]
+                if not reached:
+                    continue
+                depth = min(reached) + 1
+                for person in self.graph.stars_of(movie):
+                    if distance[person] == -1 or distance[person] > depth:
+                        distance[person] = depth
+                        queue.append(person)
+
+            while queue:
+                person = queue.popleft()
+                depth = distance[person] + 1
+                for movie in self.graph.movies_of(person):
+                    for neighbor in self.graph.stars_of(movie):
+                        if distance[neighbor] == -1 or distance[neighbor] > depth:
+                            distance[neighbor] = depth
+                            queue.append(neighbor)
+
+    def lower_bound(self, a, b):
+        """
+        Returns a lower bound on the degrees of separation between
+        person indices `a` and `b`, or None if some landmark proves
+        that they are not connected.
+        """
+        bound = 0
+        for distance in self.distances:
+            da, db = distance[a], distance[b]
+            if da == -1 and db == -1:
+                continue
+            if da == -1 or db == -1:
+                return None
+            bound = max(bound, abs(da - db))
+        return bound
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target person IDs.
+
+        If no possible path, returns None.
+        """
+        path = self.index_path(
+            self.graph.person_index[source], self.graph.person_index[target]
+        )
+        if path is None:
+            return None
+        return [
+            (self.graph.movie_ids[movie], self.graph.person_ids[person])
+            for movie, person in path
+        ]
+
+    def index_path(self, source, target):
+        """
+        A* search between two integer person indices guided by the
+        landmark lower bound, returning (movie, person) index pairs.
+
+        If no possible path, returns None.
+        """
+        bound = self.lower_bound(source, target)
+        if bound is None:
+            return None
+
+        # Heap entries are (estimate, -cost, person), preferring deeper nodes on ties
+        frontier = [(bound, 0, source)]
+        cost = {source: 0}
+        parents = {source: None}
+
+        # Cost at which each movie was expanded, later cheaper visits re-expand
+        expanded = {}
+
+        while frontier:
+            estimate, depth, person = heapq.heappop(frontier)
+            depth = -depth
+            if depth > cost[person]:
+                continue
+
+            if person == target:
+                path = []
+                while parents[person] is not None:
+                    movie, parent = parents[person]
+                    path.append((movie, person))
+                    person = parent
+                path.reverse()
+                return path
+
+            for movie in self.graph.movies_of(person):
+                if expanded.get(movie, depth + 1) <= depth:
+                    continue
+                expanded[movie] = depth
+                for neighbor in self.graph.stars_of(movie):
+                    if neighbor in cost and cost[neighbor] <= depth + 1:
+                        continue
+                    bound = self.lower_bound(neighbor, target)
+                    if bound is None:
+                        continue
+                    cost[neighbor] = depth + 1
+                    parents[neighbor] = (movie, person)
+                    heapq.heappush(frontier, (depth + 1 + bound, -(depth + 1), neighbor))
+
+        return None
+
+
+def graph_size(graph):
+    """
+    Returns the number of people and movies in `graph`.
+    """
+    return [len(graph.person_offsets) - 1, len(graph.movie_offsets) - 1]
+
+
+def index_key(directory, graph, stats=None):
+    """
+    Returns the key an index for `directory` is stored under:
+    the CSV file sizes and times, a checksum of stars.csv, the
+    snapshot version and size of the graph, and checksums of its
+    person and movie ordering.
+
+    `stats` are the sizes and times from `snapshot_key`, if known.
+    """
+    key = dict(stats or snapshot_key(directory))
+    key["snapshot"] = SNAPSHOT_VERSION
+    key["size"] = graph_size(graph)
+    with open(os.path.join(directory, "stars.csv"), "rb") as f:
+        key["stars_crc"] = checksum(f)
+    key["people"] = zlib.crc32("\n".join(graph.person_ids).encode("utf-8"))
+    key["movies"] = zlib.crc32("\n".join(graph.movie_ids).encode("utf-8"))
+    return key
+
+
+def checksum(f, size=None):
+    """
+    Returns the CRC32 of the first `size` bytes of a binary file,
+    or of the whole file if `size` is None.
+    """
+    crc = 0
+    remaining = size
+    while remaining is None or remaining > 0:
+        chunk = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+        if not chunk:
+            break
+        crc = zlib.crc32(chunk, crc)
+        if remaining is not None:
+            remaining -= len(chunk)
+    return crc
+
+
+def appended_edges(directory, graph, old_key):
+    """
+    Returns the (person, movie) index edges appended to stars.csv
+    since `old_key` was taken, or None if the file was changed in
+    any other way than appending rows.
+    """
+    old_size = old_key["stars.csv"][1]
+    with open(os.path.join(directory, "stars.csv"), "rb") as f:
+        if checksum(f, old_size) != old_key["stars_crc"]:
+            return None
+        tail = f.read().decode("utf-8")
+
+    movie_index = {movie_id: i for i, movie_id in enumerate(graph.movie_ids)}
+    edges = []
+    for row in csv.reader(io.StringIO(tail)):
+        if len(row) != 2:
+            continue
+        person = graph.person_index.get(row[0])
+        movie = movie_index.get(row[1])
+        if person is not None and movie is not None:
+            edges.append((person, movie))
+    return edges
+
+
+def load_index(directory, graph, k=LANDMARKS, filename=None):
+    """
+    Load the landmark index for `directory`, updating it in place
+    when rows were only appended to stars.csv and rebuilding it
+    from scratch after any other change.
+    """
+    if filename is None:
+        filename = os.path.join(directory, INDEX)
+    stats = snapshot_key(directory)
+
+    index = None
+    if os.path.exists(filename):
+        index, old_key = LandmarkIndex.load(graph, filename)
+
+        # An index for this graph's snapshot version and size with
+        # unchanged CSV sizes and times needs no checksums, like the
+        # graph snapshot itself
+        if index is not None and any(old_key[name] != stats[name] for name in stats):
+            key = index_key(directory, graph, stats)
+            edges = None
+            if (old_key["people"] == key["people"]
+                    and old_key["movies"] == key["movies"]
+                    and old_key["stars.csv"][1] <= key["stars.csv"][1]):
+                edges = appended_edges(directory, graph, old_key)
+            if edges is None:
+                index = None
+            else:
+                index.add_edges(edges)
+                index.save(filename, key)
+
+    if index is None:
+        index = LandmarkIndex.build(graph, k)
+        index.save(filename, index_key(directory, graph, stats))
+    return index
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python landmarks.py directory [landmarks]")
+    directory = sys.argv[1]
+    k = int(sys.argv[2]) if len(sys.argv) == 3 else LANDMARKS
+
+    print("Loading data...")
+    graph = load_graph(directory)
+    index = load_index(directory, graph, k)
+    print("Data loaded.")
+
+    source = person_id_for_name(graph, input("Name: "))
+    if source is None:
+        sys.exit("Person not found.")
+    target = person_id_for_name(graph, input("Name: "))
+    if target is None:
+        sys.exit("Person not found.")
+
+    source = graph.person_index[source]
+    print_path(graph, source, index.index_path(source, graph.person_index[target]))
+
+
+if __name__ == "__main__":
+    main()
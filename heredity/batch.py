@@ -0,0 +1,137 @@
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+import cache
+import inference
+from heredity import load_data
+
+# Factor cache shared by every family solved in this process
+factors = None
+
+FIELDS = [
+    "file", "person", "gene_2", "gene_1", "gene_0", "trait", "seconds", "states", "error"
+]
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python batch.py (directory|pattern) [output.jsonl|output.csv] [cache]")
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    filenames = family_files(sys.argv[1])
+
+    # A CSV output in the input directory is not a family
+    if output is not None:
+        filenames = [f for f in filenames if os.path.abspath(f) != os.path.abspath(output)]
+    cache_file = sys.argv[3] if len(sys.argv) > 3 else None
+
+    f = open(output, "w", newline="") if output else sys.stdout
+    writer = None
+    if output and output.endswith(".csv"):
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+
+    seconds = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(initializer=init_worker, initargs=(cache_file,)) as pool:
+        for result in pool.imap(solve, filenames):
+            seconds.append(result["seconds"])
+            if writer is not None:
+                writer.writerows(csv_rows(result))
+            else:
+                print(json.dumps(result), file=f, flush=True)
+            print(f"{result['file']}: {result['seconds']:.3f}s, "
+                  f"{result['states']} states", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    if output:
+        f.close()
+
+    if seconds:
+        seconds.sort()
+        p50 = seconds[len(seconds) // 2]
+        p99 = seconds[min(len(seconds) - 1, len(seconds) * 99 // 100)]
+        print(f"{len(seconds)} families in {elapsed:.2f}s, "
+              f"p50 {p50:.3f}s, p99 {p99:.3f}s", file=sys.stderr)
+
+
+def family_files(pattern):
+    """
+    Returns the family CSV files in a directory, or matching a glob
+    pattern, in sorted order.
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.csv")
+    filenames = sorted(glob.glob(pattern, recursive=True))
+    if not filenames:
+        sys.exit(f"No family files match {pattern}")
+    return filenames
+
+
+def init_worker(cache_file):
+    """
+    Open the factor cache in a worker process, if one is used.
+    """
+    global factors
+    if cache_file is not None:
+        factors = cache.FactorCache(cache_file)
+
+
+def state_space(people):
+    """
+    Returns the number of joint gene and trait assignments that
+    `heredity.main` would enumerate for `people`.
+    """
+    unknown = sum(1 for person in people if people[person]["trait"] is None)
+    return 3 ** len(people) * 2 ** unknown
+
+
+def solve(filename):
+    """
+    Returns the probabilities for one family file, with the time
+    taken to solve it and the size of its state space, or the error
+    if it could not be read.
+    """
+    start = time.perf_counter()
+    result = {"file": filename}
+    try:
+        people = load_data(filename)
+        result["states"] = state_space(people)
+        if factors is None:
+            result["people"] = inference.infer(people)
+        else:
+            # Writes this family's new entries before returning
+            result["people"] = cache.infer(people, factors)
+    except (OSError, KeyError, ValueError, sqlite3.Error) as e:
+        result["states"] = None
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def csv_rows(result):
+    """
+    Yields one CSV row per person in a solved family.
+    """
+    if "error" in result:
+        yield {"file": result["file"], "seconds": result["seconds"], "error": result["error"]}
+        return
+    for person, probabilities in result["people"].items():
+        yield {
+            "file": result["file"],
+            "person": person,
+            "gene_2": probabilities["gene"][2],
+            "gene_1": probabilities["gene"][1],
+            "gene_0": probabilities["gene"][0],
+            "trait": probabilities["trait"][True],
+            "seconds": result["seconds"],
+            "states": result["states"]
+        }
+
+
+if __name__ == "__main__":
+    main()
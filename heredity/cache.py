@@ -0,0 +1,274 @@
+import hashlib
+import itertools
+import json
+import sqlite3
+import sys
+import time
+
+import inference
+from heredity import PROBS, families, load_data, print_probabilities
+
+# Default cache file and the most tables it keeps
+CACHE = "heredity.cache"
+CAPACITY = 10000
+
+
+class FactorCache():
+    """
+    Persistent table of family marginals and sub-pedigree messages
+    seen before, keyed by canonical hashes, that drops the least
+    recently used entries once it holds more than `capacity`.
+
+    Lookups only read. New entries and recency updates are held back
+    until `flush` writes them all in one short transaction, so a hit
+    never keeps other processes sharing the file waiting.
+    """
+
+    def __init__(self, filename=CACHE, capacity=CAPACITY):
+        self.capacity = capacity
+
+        # Autocommit, so no transaction stays open between statements
+        self.connection = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self.pending = {}
+        self.touched = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
+
+    def get(self, key):
+        """
+        Returns the value stored under `key`, or None.
+        """
+        if key in self.pending:
+            self.hits += 1
+            return self.pending[key]
+        row = self.connection.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched.add(key)
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """
+        Stores `value` under `key` at the next `flush`.
+        """
+        self.pending[key] = value
+
+    def flush(self):
+        """
+        Writes new entries and marks the ones used since the last flush
+        as recently used, evicting the least recently used entries
+        beyond the capacity.
+        """
+        if not self.pending and not self.touched:
+            return
+        used = time.time_ns()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.executemany(
+                "UPDATE entries SET used = ? WHERE key = ?",
+                [(used, key) for key in self.touched]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                [(key, json.dumps(value), used) for key, value in self.pending.items()]
+            )
+
+            # By key, since entries written in one flush share `used`
+            self.connection.execute(
+                "DELETE FROM entries WHERE key NOT IN (SELECT key FROM entries "
+                "ORDER BY used DESC LIMIT ?)",
+                (self.capacity,)
+            )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.pending.clear()
+        self.touched.clear()
+
+
+def canonical_order(family):
+    """
+    Returns the people in `family` ordered by their ancestry and
+    evidence alone, so families that differ only in names share an
+    order. Parents always come before their children.
+    """
+    signatures = {}
+    depths = {}
+
+    def visit(person):
+        if person not in signatures:
+            parents = [family[person]["mother"], family[person]["father"]]
+            for parent in parents:
+                if parent is not None:
+                    visit(parent)
+            depths[person] = max(
+                (depths[parent] + 1 for parent in parents if parent is not None), default=0
+            )
+            described = repr((
+                family[person]["trait"],
+                [None if parent is None else signatures[parent] for parent in parents]
+            ))
+            signatures[person] = hashlib.sha256(described.encode()).hexdigest()
+
+    for person in family:
+        visit(person)
+
+    # Names only break ties between people with the same signature
+    return sorted(family, key=lambda person: (depths[person], signatures[person], person))
+
+
+def family_key(family, order):
+    """
+    Returns a hash of the pedigree, known traits and PROBS of `family`
+    with its people numbered in `order`.
+    """
+    index = {person: i for i, person in enumerate(order)}
+    pedigree = [
+        (
+            family[person]["trait"],
+            index.get(family[person]["mother"]),
+            index.get(family[person]["father"])
+        )
+        for person in order
+    ]
+    described = json.dumps([pedigree, PROBS], sort_keys=True)
+    return "family:" + hashlib.sha256(described.encode()).hexdigest()
+
+
+def message_key(factors, separator):
+    """
+    Returns a hash of the person factors an upward message summarizes,
+    with the people it is a function of marked, and those people in
+    the canonical order its table is stored in.
+
+    Factor tables already hold PROBS and any known trait, so two
+    sub-pedigrees with the same key have the same message.
+    """
+    owners = {factor.variables[0]: factor for factor in factors}
+    people = set(itertools.chain.from_iterable(factor.variables for factor in factors))
+    signatures = {}
+    depths = {}
+    descriptions = {}
+
+    def visit(person):
+        if person not in signatures:
+            factor = owners.get(person)
+            parents = factor.variables[1:] if factor is not None else ()
+            for parent in parents:
+                visit(parent)
+            depths[person] = max((depths[parent] + 1 for parent in parents), default=0)
+            descriptions[person] = (
+                person in separator,
+                None if factor is None else [
+                    factor.table[assignment] for assignment in
+                    itertools.product(inference.GENES, repeat=len(factor.variables))
+                ]
+            )
+            described = repr((descriptions[person], [signatures[p] for p in parents]))
+            signatures[person] = hashlib.sha256(described.encode()).hexdigest()
+
+    for person in sorted(people):
+        visit(person)
+
+    # As in `canonical_order`, names only break ties
+    order = sorted(people, key=lambda person: (depths[person], signatures[person], person))
+    index = {person: i for i, person in enumerate(order)}
+    sub_pedigree = [
+        (descriptions[person], [index[parent] for parent in owners[person].variables[1:]]
+         if person in owners else None)
+        for person in order
+    ]
+    key = "message:" + hashlib.sha256(repr(sub_pedigree).encode()).hexdigest()
+    return key, tuple(person for person in order if person in separator)
+
+
+def reuse_messages(cache):
+    """
+    Returns a `messages` function for `inference.gene_marginals` that
+    looks each upward message up in `cache`, computing and adding the
+    ones it does not have.
+    """
+    def messages(below, separator, compute):
+        key, variables = message_key(below, separator)
+        assignments = list(itertools.product(inference.GENES, repeat=len(variables)))
+        table = cache.get(key)
+        if table is not None:
+            return inference.Factor(variables, dict(zip(assignments, table)))
+
+        message = compute()
+        lookup = message.lookup(variables)
+        cache.put(key, [lookup(assignment) for assignment in assignments])
+        return message
+
+    return messages
+
+
+def infer(people, cache):
+    """
+    Returns the gene and trait distribution of every person, like
+    `inference.infer`, reusing the results for any family already
+    in `cache`, and for any sub-pedigree of the rest that is.
+
+    New entries are written to `cache` before returning.
+    """
+    messages = reuse_messages(cache)
+    probabilities = {}
+    for family in families(people):
+        order = canonical_order(family)
+        key = family_key(family, order)
+        marginals = cache.get(key)
+        if marginals is None:
+            result = inference.infer(family, messages)
+            marginals = [[result[person]["gene"][g] for g in (2, 1, 0)] for person in order]
+            cache.put(key, marginals)
+
+        for person, gene in zip(order, marginals):
+            trait = people[person]["trait"]
+            if trait is None:
+                have_trait = sum(
+                    p * PROBS["trait"][g][True] for g, p in zip((2, 1, 0), gene)
+                )
+            else:
+                have_trait = 1 if trait else 0
+            probabilities[person] = {
+                "gene": dict(zip((2, 1, 0), gene)),
+                "trait": {True: have_trait, False: 1 - have_trait}
+            }
+    cache.flush()
+    return {person: probabilities[person] for person in people}
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python cache.py data.csv [cache]")
+    people = load_data(sys.argv[1])
+    with FactorCache(sys.argv[2] if len(sys.argv) == 3 else CACHE) as cache:
+        print_probabilities(people, infer(people, cache))
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -60,31 +60,31 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        #  if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Families not linked through any parent are independent,
+    # so each one is enumerated on its own
+    for family in families(people):
+        family_probabilities = {person: probabilities[person] for person in family}
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+        # Loop lazily over trait sets that agree with known information,
+        # and over every assignment of genes
+        for have_trait in trait_assignments(family):
+            for one_gene, two_genes in gene_assignments(family):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+                p = joint_probability(family, one_gene, two_genes, have_trait)
+                update(family_probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
 
     # Print results
+    print_probabilities(people, probabilities)
+
+
+def print_probabilities(people, probabilities):
+    """
+    Print each person's gene and trait distributions.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -128,6 +128,64 @@ def powerset(s):
     ]
 
 
+def subsets(s):
+    """
+    Yield every subset of s as a set, one at a time.
+    """
+    s = list(s)
+    for r in range(len(s) + 1):
+        for subset in itertools.combinations(s, r):
+            yield set(subset)
+
+
+def families(people):
+    """
+    Split `people` into families connected through parent links.
+    Return a list of dictionaries in the same format as `people`.
+    """
+    family = {person: person for person in people}
+
+    def find(person):
+        while family[person] != person:
+            family[person] = family[family[person]]
+            person = family[person]
+        return person
+
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                family[find(parent)] = find(person)
+
+    groups = dict()
+    for person in people:
+        groups.setdefault(find(person), dict())[person] = people[person]
+    return list(groups.values())
+
+
+def trait_assignments(people):
+    """
+    Yield every set of people who might have the trait that agrees
+    with the known traits, so people with a known trait are fixed.
+    """
+    known = set(person for person in people if people[person]["trait"])
+    unknown = [person for person in people if people[person]["trait"] is None]
+    for have_trait in subsets(unknown):
+        yield known | have_trait
+
+
+def gene_assignments(people):
+    """
+    Yield a (one_gene, two_genes) pair of sets for every way of giving
+    each person zero, one or two copies of the gene.
+    """
+    names = list(people)
+    for genes in itertools.product((0, 1, 2), repeat=len(names)):
+        yield (
+            set(name for name, count in zip(names, genes) if count == 1),
+            set(name for name, count in zip(names, genes) if count == 2)
+        )
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -0,0 +1,250 @@
+import itertools
+import operator
+import sys
+
+from heredity import PROBS, load_data, print_probabilities
+
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    Table of non-negative values over assignments of gene counts
+    to a tuple of people.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = variables
+        self.table = table
+
+    def lookup(self, variables):
+        """
+        Returns a function mapping an assignment to `variables`
+        to this factor's value for it.
+        """
+        positions = [variables.index(v) for v in self.variables]
+        table = self.table
+        if len(positions) == 0:
+            return lambda assignment: table[()]
+        elif len(positions) == 1:
+            i = positions[0]
+            return lambda assignment: table[(assignment[i],)]
+        key = operator.itemgetter(*positions)
+        return lambda assignment: table[key(assignment)]
+
+
+def combine(factors, keep):
+    """
+    Returns the product of `factors` with every variable not in `keep`
+    summed out, scaled to sum to 1 to avoid underflow in large families.
+    """
+    variables = tuple(sorted(
+        set(itertools.chain.from_iterable(f.variables for f in factors)) | set(keep)
+    ))
+    keep = tuple(sorted(keep))
+    lookups = [f.lookup(variables) for f in factors]
+    result = Factor(keep, dict.fromkeys(itertools.product(GENES, repeat=len(keep)), 0))
+    positions = [variables.index(v) for v in keep]
+
+    for assignment in itertools.product(GENES, repeat=len(variables)):
+        value = 1
+        for lookup in lookups:
+            value *= lookup(assignment)
+        result.table[tuple(assignment[i] for i in positions)] += value
+
+    total = sum(result.table.values())
+    for key in result.table:
+        result.table[key] /= total
+    return result
+
+
+def passing(genes):
+    """
+    Probability that a parent with `genes` copies passes the gene on.
+    """
+    return (
+        1 - PROBS["mutation"] if genes == 2 else
+        0.5 if genes == 1 else
+        PROBS["mutation"]
+    )
+
+
+def inherit(genes, mother, father):
+    """
+    Probability that a child has `genes` copies given its parents'.
+    """
+    from_mother, from_father = passing(mother), passing(father)
+    return (
+        from_mother * from_father if genes == 2 else
+        from_mother * (1 - from_father) + (1 - from_mother) * from_father if genes == 1 else
+        (1 - from_mother) * (1 - from_father)
+    )
+
+
+def person_factor(people, person):
+    """
+    Returns the factor for a person's gene given their parents' genes,
+    times the likelihood of their trait if it is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    if mother is None and father is None:
+        variables = (person,)
+        table = {(genes,): PROBS["gene"][genes] for genes in GENES}
+    else:
+        variables = (person, mother, father)
+        table = {
+            assignment: inherit(*assignment)
+            for assignment in itertools.product(GENES, repeat=3)
+        }
+
+    # Observed traits are evidence on the person's own gene
+    if trait is not None:
+        for assignment in table:
+            table[assignment] *= PROBS["trait"][assignment[0]][trait]
+    return Factor(variables, table)
+
+
+def elimination_order(factors):
+    """
+    Returns a greedy variable elimination order and the scope each
+    variable's cluster has when it is eliminated.
+
+    The variable with the fewest remaining neighbors is always picked
+    next, so tree-shaped families never get a cluster wider than a
+    parent pair and a child.
+    """
+    # Interaction graph between people sharing a factor
+    neighbors = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbors.setdefault(variable, set()).update(factor.variables)
+    for variable in neighbors:
+        neighbors[variable].discard(variable)
+
+    order = []
+    scopes = {}
+    remaining = set(neighbors)
+    while remaining:
+        variable = min(sorted(remaining), key=lambda v: len(neighbors[v]))
+        remaining.remove(variable)
+        order.append(variable)
+        scopes[variable] = neighbors[variable] | {variable}
+
+        # Eliminating a variable connects all of its neighbors
+        for neighbor in neighbors[variable]:
+            neighbors[neighbor].discard(variable)
+            neighbors[neighbor].update(neighbors[variable] - {neighbor})
+    return order, scopes
+
+
+def gene_marginals(factors, messages=None):
+    """
+    Returns the normalized distribution over the gene count of every
+    person, by passing messages up and down the cluster tree that
+    variable elimination induces.
+
+    Every cluster is visited a fixed number of times, so the work grows
+    linearly with family size for families of bounded width.
+
+    If given, `messages(below, separator, compute)` is asked for each
+    upward message, where `below` is every factor summarized by it and
+    `compute` returns it, so messages can be reused between families.
+    """
+    order, scopes = elimination_order(factors)
+    position = {variable: i for i, variable in enumerate(order)}
+
+    # Each factor belongs to the cluster of its first eliminated variable
+    buckets = {variable: [] for variable in order}
+    for factor in factors:
+        buckets[min(factor.variables, key=position.get)].append(factor)
+
+    # A cluster's parent is the next of its variables to be eliminated
+    parent = {}
+    children = {variable: [] for variable in order}
+    for variable in order:
+        separator = scopes[variable] - {variable}
+        if separator:
+            parent[variable] = min(separator, key=position.get)
+            children[parent[variable]].append(variable)
+
+    # Messages from each cluster to its parent, leaves first
+    up = {}
+    below = {}
+    for variable in order:
+        if messages is not None:
+            below[variable] = buckets[variable] + [
+                factor for child in children[variable] for factor in below[child]
+            ]
+        if variable in parent:
+            incoming = buckets[variable] + [up[child] for child in children[variable]]
+            separator = scopes[variable] - {variable}
+            if messages is None:
+                up[variable] = combine(incoming, separator)
+            else:
+                up[variable] = messages(
+                    below[variable], separator,
+                    lambda: combine(incoming, separator)
+                )
+
+    # Messages from each parent back down, roots first
+    down = {}
+    for variable in reversed(order):
+        if variable in parent:
+            above = parent[variable]
+            incoming = buckets[above] + [
+                up[child] for child in children[above] if child != variable
+            ]
+            if above in down:
+                incoming.append(down[above])
+            down[variable] = combine(incoming, scopes[variable] - {variable})
+
+    marginals = {}
+    for variable in order:
+        incoming = buckets[variable] + [up[child] for child in children[variable]]
+        if variable in down:
+            incoming.append(down[variable])
+        belief = combine(incoming, {variable})
+        marginals[variable] = {genes: belief.table[(genes,)] for genes in (2, 1, 0)}
+    return marginals
+
+
+def infer(people, messages=None):
+    """
+    Returns the gene and trait distribution of every person, given the
+    known traits, in the same format `heredity.main` prints after
+    calling `normalize`.
+
+    `messages` is passed on to `gene_marginals`.
+    """
+    marginals = gene_marginals(
+        [person_factor(people, person) for person in people], messages
+    )
+    probabilities = {}
+    for person in people:
+        gene = marginals[person]
+
+        # A trait depends only on its own person's gene
+        trait = people[person]["trait"]
+        if trait is None:
+            have_trait = sum(gene[g] * PROBS["trait"][g][True] for g in GENES)
+        else:
+            have_trait = 1 if trait else 0
+        probabilities[person] = {
+            "gene": gene,
+            "trait": {True: have_trait, False: 1 - have_trait}
+        }
+    return probabilities
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python inference.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, infer(people))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from heredity import PROBS, load_data
+from inference import inherit
+
+GENES = (0, 1, 2)
+
+# Default total number of samples, split evenly between chains
+SAMPLES = 100000
+
+# Gibbs sweeps discarded at the start of every chain
+BURN_IN = 100
+
+# Two-sided 95% Student's t values for 1 to 30 degrees of freedom, for
+# the confidence intervals between chains
+T_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+
+# Normal value the t values approach with more degrees of freedom
+Z_95 = 1.960
+
+# Fewest chains run, since intervals come from the spread between them
+MIN_CHAINS = 4
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python sampling.py data.csv [gibbs|likelihood] [samples]")
+    people = load_data(sys.argv[1])
+    method = sys.argv[2] if len(sys.argv) > 2 else "gibbs"
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else SAMPLES
+    probabilities, intervals = sample(people, method, samples)
+
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                low, high = intervals[person][field][value]
+                print(f"    {value}: {p:.4f} ({low:.4f}-{high:.4f})")
+
+
+def sample(people, method="gibbs", samples=SAMPLES, chains=None, time_limit=None, seed=None):
+    """
+    Estimate every person's gene and trait distribution by sampling,
+    running independent chains in parallel processes.
+
+    `method` is "gibbs" or "likelihood". Each chain stops after its
+    share of `samples`, or after `time_limit` seconds if that is
+    reached first. Returns the probabilities in the same format as
+    `heredity.main` prints, and matching (low, high) 95% confidence
+    intervals from the spread between chains, so at least MIN_CHAINS
+    chains are run, even if that is more than there are processes.
+
+    Every chain counts at least one sample, however soon `time_limit`
+    is reached.
+    """
+    if samples < 1:
+        raise ValueError("at least one sample is needed")
+    if chains is None:
+        chains = max(MIN_CHAINS, os.cpu_count() or 1)
+    elif chains < MIN_CHAINS:
+        raise ValueError(f"at least {MIN_CHAINS} chains are needed for intervals")
+    run = {"gibbs": gibbs, "likelihood": likelihood_weighting}[method]
+    deadline = None if time_limit is None else time.time() + time_limit
+    seeds = random.Random(seed).sample(range(2 ** 32), chains)
+    tasks = [(people, math.ceil(samples / chains), deadline, s) for s in seeds]
+
+    with multiprocessing.Pool(min(chains, os.cpu_count() or 1)) as pool:
+        estimates = pool.starmap(run, tasks)
+
+    probabilities = {}
+    intervals = {}
+    for person in people:
+        probabilities[person] = {}
+        intervals[person] = {}
+        for field, values in [("gene", (2, 1, 0)), ("trait", (True, False))]:
+            probabilities[person][field] = {}
+            intervals[person][field] = {}
+            for value in values:
+                points = [estimate[person][field][value] for estimate in estimates]
+                mean = sum(points) / len(points)
+                spread = math.sqrt(
+                    sum((p - mean) ** 2 for p in points) / (len(points) - 1)
+                )
+                margin = t_value(len(points) - 1) * spread / math.sqrt(len(points))
+                probabilities[person][field][value] = mean
+                intervals[person][field][value] = (max(0, mean - margin), min(1, mean + margin))
+    return probabilities, intervals
+
+
+def t_value(df):
+    """
+    Returns the two-sided 95% Student's t value for `df` degrees of
+    freedom, from T_95 or, beyond it, a series around the normal value.
+    """
+    if df <= len(T_95):
+        return T_95[df - 1]
+    return Z_95 + (Z_95 ** 3 + Z_95) / (4 * df) + (
+        5 * Z_95 ** 5 + 16 * Z_95 ** 3 + 3 * Z_95
+    ) / (96 * df ** 2)
+
+
+def topological_order(people):
+    """
+    Return the people ordered so that parents come before children.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person in placed:
+            return
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                place(parent)
+        placed.add(person)
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
+def gene_distribution(people, person, genes):
+    """
+    Return the probability of each gene count for `person`, given the
+    gene counts already chosen for their parents in `genes`.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    if mother is None and father is None:
+        return [PROBS["gene"][g] for g in GENES]
+    return [inherit(g, genes[mother], genes[father]) for g in GENES]
+
+
+def estimate(people, gene_weights, trait_weights, total):
+    """
+    Return accumulated weights as normalized probabilities, with known
+    traits set to certainty.
+    """
+    probabilities = {}
+    for person in people:
+        trait = people[person]["trait"]
+        have_trait = trait_weights[person] / total if trait is None else float(trait)
+        probabilities[person] = {
+            "gene": {g: gene_weights[person][g] / total for g in (2, 1, 0)},
+            "trait": {True: have_trait, False: 1 - have_trait}
+        }
+    return probabilities
+
+
+def likelihood_weighting(people, samples, deadline=None, seed=None):
+    """
+    Estimate gene and trait distributions by sampling genes from
+    PROBS in parent-first order, weighting each sample by how likely
+    it makes the known traits.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    gene_weights = {person: [0, 0, 0] for person in people}
+    trait_weights = dict.fromkeys(people, 0)
+    total = 0
+
+    # The deadline is only checked once a sample has been drawn
+    for i in range(samples):
+        if deadline is not None and i > 0 and i % 100 == 0 and time.time() > deadline:
+            break
+        genes = {}
+        weight = 1
+        for person in order:
+            genes[person] = rng.choices(GENES, gene_distribution(people, person, genes))[0]
+            trait = people[person]["trait"]
+            if trait is not None:
+                weight *= PROBS["trait"][genes[person]][trait]
+
+        total += weight
+        for person in people:
+            gene_weights[person][genes[person]] += weight
+
+            # Unknown traits are averaged exactly instead of sampled
+            trait_weights[person] += weight * PROBS["trait"][genes[person]][True]
+
+    if total == 0:
+        raise ValueError("every sample is impossible given the known traits")
+    return estimate(people, gene_weights, trait_weights, total)
+
+
+def gibbs(people, samples, deadline=None, seed=None):
+    """
+    Estimate gene and trait distributions by Gibbs sampling, each
+    sweep redrawing every person's gene given the rest of the family.
+
+    Each person's conditional distribution is accumulated at every
+    sweep rather than just the gene drawn from it.
+    """
+    rng = random.Random(seed)
+    order = topological_order(people)
+    children = {person: [] for person in people}
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                children[parent].append(person)
+
+    # Start from a draw from the prior so every state has support
+    genes = {}
+    for person in order:
+        genes[person] = rng.choices(GENES, gene_distribution(people, person, genes))[0]
+
+    gene_weights = {person: [0, 0, 0] for person in people}
+    trait_weights = dict.fromkeys(people, 0)
+    total = 0
+
+    for sweep in range(BURN_IN + samples):
+        # Burn-in and the first counted sweep always run, so there is
+        # something to report
+        if (deadline is not None and sweep > BURN_IN and sweep % 10 == 0
+                and time.time() > deadline):
+            break
+        for person in order:
+            weights = gene_distribution(people, person, genes)
+            trait = people[person]["trait"]
+            for g in GENES:
+                if trait is not None:
+                    weights[g] *= PROBS["trait"][g][trait]
+                genes[person] = g
+                for child in children[person]:
+                    weights[g] *= inherit(
+                        genes[child],
+                        genes[people[child]["mother"]],
+                        genes[people[child]["father"]]
+                    )
+            norm = sum(weights)
+            weights = [w / norm for w in weights]
+            genes[person] = rng.choices(GENES, weights)[0]
+
+            if sweep >= BURN_IN:
+                for g in GENES:
+                    gene_weights[person][g] += weights[g]
+                    trait_weights[person] += weights[g] * PROBS["trait"][g][True]
+        if sweep >= BURN_IN:
+            total += 1
+
+    return estimate(people, gene_weights, trait_weights, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import sys
+
+import numpy as np
+
+from heredity import PROBS, load_data, print_probabilities
+from inference import inherit
+
+# Gene assignments scored together in one batch of array operations
+CHUNK = 3 ** 10
+
+
+def factor_tables():
+    """
+    Returns the gene, inheritance and trait tables built from PROBS as
+    arrays indexed by gene counts (and trait, False = 0, True = 1).
+    """
+    gene = np.array([PROBS["gene"][genes] for genes in range(3)])
+    inheritance = np.array([
+        [[inherit(genes, mother, father) for father in range(3)] for mother in range(3)]
+        for genes in range(3)
+    ])
+    trait = np.array([
+        [PROBS["trait"][genes][False], PROBS["trait"][genes][True]] for genes in range(3)
+    ])
+    return gene, inheritance, trait
+
+
+def joint_probabilities(people, names, genes, tables):
+    """
+    Returns the joint probability of each row of `genes`, an array of
+    gene counts with one column per person in `names`, together with
+    every known trait.
+
+    Unknown traits are summed out, which contributes a factor of 1.
+    """
+    gene, inheritance, trait = tables
+    index = {name: i for i, name in enumerate(names)}
+    founders = [index[p] for p in names if people[p]["mother"] is None]
+    children = [index[p] for p in names if people[p]["mother"] is not None]
+    mothers = [index[people[names[i]]["mother"]] for i in children]
+    fathers = [index[people[names[i]]["father"]] for i in children]
+    observed = [index[p] for p in names if people[p]["trait"] is not None]
+    traits = [int(people[names[i]]["trait"]) for i in observed]
+    founders, children, mothers, fathers, observed, traits = (
+        np.array(indices, dtype=np.intp)
+        for indices in (founders, children, mothers, fathers, observed, traits)
+    )
+
+    return (
+        gene[genes[:, founders]].prod(axis=1)
+        * inheritance[genes[:, children], genes[:, mothers], genes[:, fathers]].prod(axis=1)
+        * trait[genes[:, observed], traits].prod(axis=1)
+    )
+
+
+def infer(people):
+    """
+    Returns the gene and trait distribution of every person, given the
+    known traits, by scoring every gene assignment with array operations.
+
+    The result has the same format `heredity.main` prints after
+    calling `normalize`.
+    """
+    names = list(people)
+    tables = factor_tables()
+    powers = 3 ** np.arange(len(names))
+    rows = np.broadcast_to(np.arange(len(names)), (CHUNK, len(names)))
+
+    # Unnormalized gene marginals, one row per person
+    marginals = np.zeros((len(names), 3))
+    total = 3 ** len(names)
+    for start in range(0, total, CHUNK):
+        codes = np.arange(start, min(start + CHUNK, total))
+        genes = (codes[:, None] // powers) % 3
+        p = joint_probabilities(people, names, genes, tables)
+        np.add.at(marginals, (rows[:len(codes)], genes), p[:, None])
+
+    marginals /= marginals.sum(axis=1, keepdims=True)
+    have_trait = marginals @ tables[2][:, 1]
+
+    probabilities = {}
+    for i, person in enumerate(names):
+        trait = people[person]["trait"]
+        if trait is not None:
+            have_trait[i] = 1 if trait else 0
+        probabilities[person] = {
+            "gene": {genes: marginals[i, genes].item() for genes in (2, 1, 0)},
+            "trait": {True: have_trait[i].item(), False: 1 - have_trait[i].item()}
+        }
+    return probabilities
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python vectorized.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, infer(people))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Largest number of symbols checked exhaustively, 2 ** 25 bits per column
+MAX_SYMBOLS = 25
+
+
+class TruthTable():
+    """
+    Every model over `symbols` at once, with the value of a sentence in
+    all 2 ** n models packed into one integer column, where bit m is
+    its value in the model in which symbol i is true if bit i of m is.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = sorted(symbols)
+        if len(self.symbols) > MAX_SYMBOLS:
+            raise ValueError(
+                f"{len(self.symbols)} symbols, at most {MAX_SYMBOLS} can be checked"
+            )
+        size = 1 << len(self.symbols)
+        self.full = (1 << size) - 1
+
+        # Symbol i repeats 2 ** i false models then 2 ** i true ones,
+        # built by doubling since big int division is quadratic
+        self.columns = {}
+        for i, name in enumerate(self.symbols):
+            half = 1 << i
+            column = ((1 << half) - 1) << half
+            width = 2 * half
+            while width < size:
+                column |= column << width
+                width *= 2
+            self.columns[name] = column
+        self.cache = {}
+
+    def column(self, sentence):
+        """
+        Returns the column of `sentence`, evaluating it with bitwise
+        operations on whole columns.
+        """
+        if isinstance(sentence, Symbol):
+            return self.columns[sentence.name]
+        if sentence in self.cache:
+            return self.cache[sentence]
+
+        if isinstance(sentence, Not):
+            result = self.full ^ self.column(sentence.operand)
+        elif isinstance(sentence, And):
+            result = self.full
+            for conjunct in sentence.conjuncts:
+                result &= self.column(conjunct)
+        elif isinstance(sentence, Or):
+            result = 0
+            for disjunct in sentence.disjuncts:
+                result |= self.column(disjunct)
+        elif isinstance(sentence, Implication):
+            antecedent = self.column(sentence.antecedent)
+            result = (self.full ^ antecedent) | self.column(sentence.consequent)
+        elif isinstance(sentence, Biconditional):
+            result = self.full ^ self.column(sentence.left) ^ self.column(sentence.right)
+        else:
+            raise TypeError(f"cannot evaluate {sentence} bitwise")
+
+        # Shared subformulas are only evaluated once
+        self.cache[sentence] = result
+        return result
+
+    def entails(self, knowledge, query):
+        """
+        Checks if `query` is true in every model where `knowledge` is.
+        """
+        return self.column(knowledge) & ~self.column(query) == 0
+
+
+def entailed(knowledge, queries):
+    """
+    Checks which of `queries` the knowledge base entails, evaluating
+    the knowledge once and every query over all models in one pass.
+    """
+    symbols = set.union(knowledge.symbols(), *(query.symbols() for query in queries))
+    table = TruthTable(symbols)
+    models = table.column(knowledge)
+    return [models & ~table.column(query) == 0 for query in queries]
+
+
+def bitwise_check(knowledge, query):
+    """Checks if knowledge base entails query, using bitwise columns."""
+    return entailed(knowledge, [query])[0]
@@ -0,0 +1,72 @@
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+def expression(sentence, index):
+    """
+    Returns Python source for `sentence` as an expression over the
+    integer `m`, in which bit `index[name]` holds each symbol's value.
+    """
+    if isinstance(sentence, Symbol):
+        return f"(m & {1 << index[sentence.name]})"
+    if isinstance(sentence, Not):
+        return f"(not {expression(sentence.operand, index)})"
+    if isinstance(sentence, And):
+        if not sentence.conjuncts:
+            return "True"
+        return "(" + " and ".join(expression(c, index) for c in sentence.conjuncts) + ")"
+    if isinstance(sentence, Or):
+        if not sentence.disjuncts:
+            return "False"
+        return "(" + " or ".join(expression(d, index) for d in sentence.disjuncts) + ")"
+    if isinstance(sentence, Implication):
+        antecedent = expression(sentence.antecedent, index)
+        consequent = expression(sentence.consequent, index)
+        return f"(not {antecedent} or {consequent})"
+    if isinstance(sentence, Biconditional):
+        left = expression(sentence.left, index)
+        right = expression(sentence.right, index)
+        return f"((not {left}) == (not {right}))"
+    raise TypeError(f"cannot compile {sentence}")
+
+
+def build(source, name):
+    """
+    Executes generated source and returns the function it defines.
+    """
+    namespace = {}
+    exec(compile(source, f"<compiled {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def compile_sentence(sentence, symbols):
+    """
+    Returns a function that evaluates `sentence` on a model given as
+    an integer, in which bit i is the value of the i-th name in
+    `symbols`.
+    """
+    index = {name: i for i, name in enumerate(symbols)}
+    source = f"def evaluate(m):\n    return bool({expression(sentence, index)})\n"
+    return build(source, "evaluate")
+
+
+def to_bits(model, symbols):
+    """
+    Returns a model dictionary as an integer for a compiled sentence.
+    """
+    return sum(1 << i for i, name in enumerate(symbols) if model[name])
+
+
+def compiled_model_check(knowledge, query):
+    """Checks if knowledge base entails query, using compiled sentences."""
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    index = {name: i for i, name in enumerate(symbols)}
+
+    # The whole loop over models is generated, so no call is made per model
+    source = (
+        "def check():\n"
+        f"    for m in range({1 << len(symbols)}):\n"
+        f"        if {expression(knowledge, index)} and not {expression(query, index)}:\n"
+        "            return False\n"
+        "    return True\n"
+    )
+    return build(source, "check")()
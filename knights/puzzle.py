@@ -1,4 +1,5 @@
 from logic import *
+from bitwise import entailed
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -89,8 +90,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            # Every symbol is checked against all models in one pass
+            for symbol, entails in zip(symbols, entailed(knowledge, symbols)):
+                if entails:
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,400 @@
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Conflicts before the first restart, and how much the limit grows after each
+RESTART = 100
+RESTART_GROWTH = 1.5
+
+# Factor variable activities decay by after every conflict
+DECAY = 0.95
+
+
+class CNF():
+    """
+    Clauses equisatisfiable with the sentences added to them, built
+    with the Tseitin encoding. Clauses are lists of nonzero integers,
+    where n stands for variable n and -n for its negation.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.clauses = []
+
+        # Variable for each symbol name, and literal for each subformula
+        self.variables = {}
+        self.literals = {}
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def add(self, sentence):
+        """
+        Adds clauses requiring `sentence` to be true.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is,
+        adding clauses defining a new variable for it if needed.
+        """
+        if isinstance(sentence, Symbol):
+            if sentence.name not in self.variables:
+                self.variables[sentence.name] = self.new_variable()
+            return self.variables[sentence.name]
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, And):
+            operands = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            v = self.new_variable()
+            self.clauses.extend([-v, operand] for operand in operands)
+            self.clauses.append([v] + [-operand for operand in operands])
+        elif isinstance(sentence, Or):
+            operands = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            v = self.new_variable()
+            self.clauses.extend([v, -operand] for operand in operands)
+            self.clauses.append([-v] + operands)
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            v = self.new_variable()
+            self.clauses.extend([[v, antecedent], [v, -consequent]])
+            self.clauses.append([-v, -antecedent, consequent])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            v = self.new_variable()
+            self.clauses.extend([
+                [-v, -left, right], [-v, left, -right],
+                [v, left, right], [v, -left, -right]
+            ])
+        else:
+            raise TypeError(f"cannot convert {sentence} to CNF")
+
+        self.literals[sentence] = v
+        return v
+
+
+class Solver():
+    """
+    CDCL SAT solver with two watched literals per clause, first-UIP
+    clause learning, non-chronological backjumping, activity-based
+    branching and restarts.
+
+    Clauses can be added between calls to `solve`, and learned clauses
+    are kept, so a solver can answer many related questions.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.watches = {}
+        self.unsat = False
+
+        # Per variable state, indexed by variable (index 0 is unused)
+        self.assignment = [None]
+        self.level = [0]
+        self.reason = [None]
+        self.phase = [False]
+        self.activity = [0.0]
+        self.increment = 1.0
+        self.heap = []
+
+        # Assigned literals in order, where each decision level starts
+        # and how far along unit propagation has got
+        self.trail = []
+        self.levels = []
+        self.head = 0
+
+    def value(self, literal):
+        """
+        Returns True or False for an assigned literal, None otherwise.
+        """
+        value = self.assignment[abs(literal)]
+        if value is None:
+            return None
+        return value == (literal > 0)
+
+    def reserve(self, count):
+        """
+        Makes room for variables up to `count`.
+        """
+        for variable in range(len(self.assignment), count + 1):
+            self.assignment.append(None)
+            self.level.append(0)
+            self.reason.append(None)
+            self.phase.append(False)
+            self.activity.append(0.0)
+            self.watches[variable] = []
+            self.watches[-variable] = []
+            heapq.heappush(self.heap, (0.0, variable))
+
+    def add_clause(self, clause):
+        """
+        Adds a clause, simplifying it against the facts known so far.
+        """
+        if self.unsat:
+            return
+        self.backtrack(0)
+        self.reserve(max((abs(literal) for literal in clause), default=0))
+
+        literals = []
+        for literal in clause:
+            value = self.value(literal)
+            if value is True or -literal in literals:
+                return
+            if value is None and literal not in literals:
+                literals.append(literal)
+
+        if len(literals) == 0:
+            self.unsat = True
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            if self.propagate() is not None:
+                self.unsat = True
+        else:
+            self.watch(literals)
+
+    def watch(self, clause):
+        """
+        Stores a clause, watching its first two literals, and returns
+        its index.
+        """
+        self.clauses.append(clause)
+        index = len(self.clauses) - 1
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.assignment[variable] = literal > 0
+        self.level[variable] = len(self.levels)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal implied by unit clauses, returning the
+        index of a clause with every literal false, or None.
+        """
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches[false]
+            kept = []
+            for i, index in enumerate(watching):
+                clause = self.clauses[index]
+
+                # Keep the false literal second
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(index)
+                    continue
+
+                # Watch another literal that is not false, if there is one
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.value(clause[0]) is False:
+                        kept.extend(watching[i + 1:])
+                        self.watches[false] = kept
+                        return index
+                    self.assign(clause[0], index)
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the first-UIP clause learned from a conflict, with the
+        literal to assert first, and the level to backjump to.
+        """
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        current = len(self.levels)
+
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if other == literal or variable in seen or self.level[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.level[variable] == current:
+                    pending += 1
+                else:
+                    learned.append(other)
+
+            # Resolve on the latest assigned literal in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[abs(literal)]]
+
+        learned[0] = -literal
+        if len(learned) == 1:
+            return learned, 0
+
+        # Watch the literal from the highest remaining level second
+        second = max(range(1, len(learned)), key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[second] = learned[second], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, len(self.activity))]
+            heapq.heapify(self.heap)
+        elif self.assignment[variable] is None:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """
+        Undoes every assignment above decision level `level`.
+        """
+        if len(self.levels) <= level:
+            return
+        start = self.levels[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.assignment[variable] = None
+            self.reason[variable] = None
+            self.phase[variable] = literal > 0
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.levels[level:]
+        self.head = start
+
+    def decide(self):
+        """
+        Returns the unassigned variable with the highest activity,
+        or None if every variable is assigned.
+        """
+        while self.heap:
+            variable = heapq.heappop(self.heap)[1]
+            if self.assignment[variable] is None:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns a satisfying assignment, as a list indexed by variable,
+        in which every literal in `assumptions` is true, or None if
+        there is none.
+        """
+        if self.unsat:
+            return None
+        self.backtrack(0)
+        conflicts = 0
+        limit = RESTART
+
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if len(self.levels) == 0:
+                    self.unsat = True
+                    return None
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.watch(learned))
+                self.increment /= DECAY
+
+                conflicts += 1
+                if conflicts >= limit:
+                    conflicts = 0
+                    limit *= RESTART_GROWTH
+                    self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one level each
+            if len(self.levels) < len(assumptions):
+                literal = assumptions[len(self.levels)]
+                value = self.value(literal)
+                if value is False:
+                    return None
+                self.levels.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                return list(self.assignment)
+            self.levels.append(len(self.trail))
+            self.assign(variable if self.phase[variable] else -variable, None)
+
+
+class KnowledgeBase():
+    """
+    Knowledge encoded once into a SAT solver, which then answers
+    entailment queries one at a time.
+    """
+
+    def __init__(self, knowledge):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.added = 0
+        self.cnf.add(knowledge)
+        self.sync()
+
+    def sync(self):
+        """
+        Passes clauses added to the encoding on to the solver.
+        """
+        self.solver.reserve(self.cnf.count)
+        for clause in self.cnf.clauses[self.added:]:
+            self.solver.add_clause(clause)
+        self.added = len(self.cnf.clauses)
+
+    def entails(self, query):
+        """
+        Checks if the knowledge entails `query`, that is, whether the
+        knowledge and the negation of `query` are unsatisfiable.
+        """
+        literal = self.cnf.literal(query)
+        self.sync()
+        return self.solver.solve([-literal]) is None
+
+    def model(self):
+        """
+        Returns a model of the knowledge mapping symbol names to
+        values, or None if the knowledge is unsatisfiable.
+        """
+        assignment = self.solver.solve()
+        if assignment is None:
+            return None
+        return {
+            name: bool(assignment[variable])
+            for name, variable in self.cnf.variables.items()
+        }
+
+
+def sat_check(knowledge, query):
+    """Checks if knowledge base entails query, using a SAT solver."""
+    return KnowledgeBase(knowledge).entails(query)
@@ -0,0 +1,304 @@
+import csv
+import gc
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import matrix
+from pagerank import DAMPING, SAMPLES, iterate_pagerank, sample_pagerank
+
+# Graph sizes benchmarked by default
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+
+# Synthetic graph shape
+MEAN_DEGREE = 8
+EXPONENT = 2.1
+DANGLING = 0.1
+
+# Tolerance of the reference solution errors are measured against
+REFERENCE_TOLERANCE = 1e-12
+
+FIELDS = [
+    "date", "nodes", "edges", "dangling", "backend",
+    "seconds", "peak_rss_kb", "iterations", "l1_error", "error"
+]
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python benchmark.py results.csv [nodes ...]")
+    filename = sys.argv[1]
+    sizes = [int(size) for size in sys.argv[2:]] or SIZES
+
+    # Append so results from earlier runs stay around for comparison
+    exists = os.path.exists(filename)
+    if exists:
+        with open(filename, newline="") as f:
+            if next(csv.reader(f), FIELDS) != FIELDS:
+                sys.exit(f"{filename} has different columns, use a new results file")
+    with open(filename, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if not exists:
+            writer.writeheader()
+        date = datetime.now().isoformat(timespec="seconds")
+        for size in sizes:
+            for row in benchmark(size):
+                row["date"] = date
+                writer.writerow(row)
+                f.flush()
+                print(", ".join(f"{field}: {row.get(field, '')}" for field in FIELDS[1:]))
+
+
+def power_law_graph(n, mean_degree=MEAN_DEGREE, exponent=EXPONENT,
+                    dangling=DANGLING, seed=0):
+    """
+    Return a LinkMatrix for a synthetic web graph of `n` pages.
+
+    Out-degrees follow a power law with the given `exponent` and mean,
+    a `dangling` fraction of pages have no links at all, and links
+    prefer popular pages, so in-degrees follow a power law as well.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Pareto out-degrees rescaled to the requested mean
+    degree = rng.pareto(exponent - 1, size=n) + 1
+    degree = np.minimum(np.round(degree * mean_degree / degree.mean()), n - 1)
+    degree = degree.astype(np.int64)
+    degree[rng.random(n) < dangling] = 0
+
+    # Page i is linked to with weight proportional to (i + 1) ** (-1 / (exponent - 1))
+    popularity = np.cumsum(np.arange(1, n + 1) ** (-1 / (exponent - 1)))
+    sources = np.repeat(np.arange(n), degree)
+    targets = np.searchsorted(popularity, rng.random(len(sources)) * popularity[-1])
+    targets = rng.permutation(n)[targets]
+
+    # Drop self links and duplicates, as `crawl` does
+    keep = sources != targets
+    links = np.unique(sources[keep] * n + targets[keep])
+    return matrix.LinkMatrix(range(n), links // n, links % n)
+
+
+def to_corpus(graph):
+    """
+    Return a LinkMatrix as a corpus dictionary, naming pages by index.
+    """
+    corpus = {str(page): set() for page in range(graph.size)}
+    for source, target in zip(graph.sources.tolist(), graph.targets.tolist()):
+        corpus[str(source)].add(str(target))
+    return corpus
+
+
+def from_ranks(ranks, size):
+    """
+    Return a rank dictionary keyed by page index name as an array.
+    """
+    return np.array([ranks.get(str(page), 0) for page in range(size)])
+
+
+def prepare_corpus(graph, directory):
+    """Return a graph as a corpus dictionary for the pure Python backends."""
+    return to_corpus(graph)
+
+
+def run_sample(corpus):
+    """Rank with `sample_pagerank`."""
+    return from_ranks(sample_pagerank(corpus, DAMPING, SAMPLES), len(corpus)), None
+
+
+def run_iterate(corpus):
+    """Rank with `iterate_pagerank`."""
+    trace = []
+    ranks = iterate_pagerank(corpus, DAMPING, trace)
+    return from_ranks(ranks, len(corpus)), len(trace)
+
+
+def run_power(graph):
+    """Rank with sparse power iteration."""
+    trace = []
+    return matrix.matrix_pagerank(graph, DAMPING, trace=trace), len(trace)
+
+
+def run_vector_sample(graph):
+    """Rank with the vectorized sampler, 100 samples per page."""
+    samples = max(SAMPLES, 100 * graph.size)
+    return matrix.matrix_sample_pagerank(graph, DAMPING, samples), None
+
+
+def run_parallel(graph):
+    """Rank with the block-parallel solver."""
+    trace = []
+    return matrix.parallel_pagerank(graph, DAMPING, trace=trace), len(trace)
+
+
+def run_gauss_seidel(graph):
+    """Rank with the block-parallel solver in Gauss-Seidel order."""
+    trace = []
+    ranks = matrix.parallel_pagerank(graph, DAMPING, gauss_seidel=True, trace=trace)
+    return ranks, len(trace)
+
+
+def write_memmap(graph, directory):
+    """Write a graph as a binary edge file, returning its name."""
+    indptr, links = graph.out_links()
+    filename = os.path.join(directory, "graph.edges")
+    with open(f"{filename}.pages", "w", encoding="utf-8") as f:
+        for page in range(graph.size):
+            f.write(f"{page}\n")
+    edges = np.empty((len(links), 2), dtype=np.int32)
+    edges[:, 0] = np.repeat(np.arange(graph.size), graph.out_degree)
+    edges[:, 1] = links
+    edges.tofile(filename)
+    return filename
+
+
+def run_memmap(filename):
+    """Rank out of core from a binary edge file."""
+    trace = []
+    pages, ranks = matrix.memmap_pagerank(filename, DAMPING, trace=trace)
+    return ranks, len(trace)
+
+
+# Backends with the largest graph each is still run on, and the
+# untimed step that turns the graph into their input, if any
+BACKENDS = [
+    ("sample_pagerank", run_sample, 10 ** 3, prepare_corpus),
+    ("iterate_pagerank", run_iterate, 10 ** 3, prepare_corpus),
+    ("power", run_power, 10 ** 7, None),
+    ("vector_sample", run_vector_sample, 10 ** 6, None),
+    ("parallel", run_parallel, 10 ** 7, None),
+    ("gauss_seidel", run_gauss_seidel, 10 ** 7, None),
+    ("memmap", run_memmap, 10 ** 7, write_memmap)
+]
+
+
+def benchmark(size):
+    """
+    Run every backend that handles a graph of `size` pages, yielding
+    a result row for each one, with an error for backends that fail.
+
+    Every backend runs in a forked process that builds its own copy of
+    the graph. This process never holds the graph or the reference
+    ranks, since a forked child's resident set starts with the pages
+    it inherits.
+    """
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as directory:
+        reference = os.path.join(directory, "reference.npy")
+        stats, exitcode = run_child(context, solve_reference, size, reference)
+        if stats is None:
+            yield {"nodes": size, "backend": "reference", "error": f"exit code {exitcode}"}
+            return
+
+        for name, run, limit, prepare in BACKENDS:
+            if size > limit:
+                continue
+            row = {"nodes": size, "backend": name, **stats}
+            result, exitcode = run_child(context, measure, run, prepare, size, reference)
+            if result is None:
+                # The backend crashed, for instance by running out of memory
+                row["error"] = f"exit code {exitcode}"
+            elif "error" in result:
+                row["error"] = result["error"]
+            else:
+                row.update({
+                    "seconds": f"{result['seconds']:.4f}",
+                    "peak_rss_kb": result["peak"],
+                    "iterations": result["iterations"],
+                    "l1_error": f"{result['error_l1']:.3e}"
+                })
+            yield row
+
+
+def run_child(context, target, *args):
+    """
+    Run `target(*args, sender)` in a forked process, returning what it
+    sends back, or None if it died first, and its exit code.
+    """
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=(*args, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    return result, process.exitcode
+
+
+def solve_reference(size, filename, sender):
+    """
+    Save the reference ranks of the graph of `size` pages to
+    `filename` and send back its edge and dangling page counts.
+    """
+    graph = power_law_graph(size)
+    np.save(filename, matrix.matrix_pagerank(graph, DAMPING, REFERENCE_TOLERANCE))
+    sender.send({"edges": len(graph.sources), "dangling": int(graph.dangling.sum())})
+    sender.close()
+
+
+def reset_peak_rss():
+    """
+    Reset this process's peak RSS to its current RSS, where Linux
+    allows it.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Return this process's peak RSS in kB since the last reset, or
+    since it started where resets are not supported.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(run, prepare, size, reference, sender):
+    """
+    Time one backend and send back its wall time, peak RSS,
+    iteration count and L1 error against the reference.
+
+    The peak RSS covers the backend's input and everything it
+    allocates, but not building the graph or preparing the input.
+    """
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            data = power_law_graph(size)
+            if prepare is not None:
+                data = prepare(data, directory)
+            gc.collect()
+            reset_peak_rss()
+
+            started = time.perf_counter()
+            ranks, iterations = run(data)
+            seconds = time.perf_counter() - started
+            peak = peak_rss()
+
+            error = np.abs(ranks - np.load(reference)).sum()
+        sender.send({
+            "seconds": seconds, "peak": peak, "iterations": iterations, "error_l1": error
+        })
+    except Exception as e:
+        sender.send({"error": f"{type(e).__name__}: {e}"})
+    sender.close()
+
+
+if __name__ == "__main__":
+    main()
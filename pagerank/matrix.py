@@ -0,0 +1,601 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pagerank import DAMPING, SAMPLES, crawl
+
+# L1 distance between successive rank vectors at which iteration stops
+TOLERANCE = 1e-8
+
+# Iterations after which the ranks so far are returned even if they
+# have not converged to within the tolerance
+MAX_ITERATIONS = 1000
+
+# Number of random surfers simulated side by side when sampling
+WALKERS = 65536
+
+# Number of edges read from an edge file at a time
+CHUNK = 1 << 20
+
+# Blocks of pages handed to each solver process per sweep
+BLOCKS_PER_PROCESS = 4
+
+# Pages updated together within a block, newer ranks are visible
+# to later slices when solving in Gauss-Seidel order
+SLICE = 4096
+
+# Shared graph and rank arrays, set in each solver process
+solver = None
+
+# Uncounted steps each surfer takes before sampling, after which the
+# start page carries at most DAMPING ** BURN_IN of the distribution
+BURN_IN = 50
+
+
+class LinkMatrix():
+    """
+    Sparse column-stochastic transition matrix of a corpus.
+
+    Links are stored in CSR form by target page: the pages linking to
+    page `i` are `sources[indptr[i]:indptr[i + 1]]`. Pages without
+    links are treated as linking to every page, as in `transition_model`.
+    """
+
+    def __init__(self, pages, sources, targets):
+        self.pages = pages
+        self.size = len(pages)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        order = np.argsort(targets, kind="stable")
+        self.sources = sources[order]
+        self.targets = targets[order]
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=self.size), out=self.indptr[1:])
+
+        self.out_degree = np.bincount(sources, minlength=self.size)
+        self.dangling = self.out_degree == 0
+
+        # Weight of each link, 1 / out-degree of its source page
+        self.weights = 1 / self.out_degree[self.sources]
+
+        # Outgoing links in CSR form by source page, built when first needed
+        self._out_indptr = None
+        self._out_links = None
+
+        # Personalized PageRank vectors already solved, by teleport set
+        self.cache = {}
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the matrix for a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources, targets = [], []
+        for page in pages:
+            for link in corpus[page]:
+                sources.append(index[page])
+                targets.append(index[link])
+        return cls(pages, sources, targets)
+
+    def out_links(self):
+        """
+        Returns (indptr, links) CSR arrays of outgoing links, so the
+        pages linked to by page `i` are `links[indptr[i]:indptr[i + 1]]`.
+        """
+        if self._out_indptr is None:
+            order = np.argsort(self.sources, kind="stable")
+            self._out_links = self.targets[order]
+            self._out_indptr = np.zeros(self.size + 1, dtype=np.int64)
+            np.cumsum(self.out_degree, out=self._out_indptr[1:])
+        return self._out_indptr, self._out_links
+
+    def multiply(self, ranks):
+        """
+        Returns the rank flowing along links into every page, for a
+        rank vector or a matrix with one rank vector per column.
+        """
+        flow = ranks[self.sources] * (
+            self.weights if ranks.ndim == 1 else self.weights[:, None]
+        )
+
+        # Segment sums by target page using the CSR row pointers
+        totals = np.zeros((len(flow) + 1,) + flow.shape[1:])
+        np.cumsum(flow, axis=0, out=totals[1:])
+        return totals[self.indptr[1:]] - totals[self.indptr[:-1]]
+
+    def step(self, ranks, damping_factor):
+        """
+        Returns the next rank vector after one power iteration step.
+        """
+        dangling = ranks[self.dangling].sum(axis=0)
+        return (
+            (1 - damping_factor) / self.size
+            + damping_factor * (self.multiply(ranks) + dangling / self.size)
+        )
+
+
+def matrix_pagerank(matrix, damping_factor, tolerance=TOLERANCE, initial=None, trace=None,
+                    max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a LinkMatrix by power iteration,
+    stopping once successive vectors are within `tolerance` in L1,
+    or after `max_iterations`.
+
+    Iteration starts from the uniform vector, or from `initial` when
+    a previous solution close to the answer is known. If `trace` is a
+    list, (seconds, residual) is appended to it after every iteration.
+    """
+    if initial is None:
+        ranks = np.full(matrix.size, 1 / matrix.size)
+    else:
+        ranks = initial / initial.sum()
+    for _ in range(max_iterations):
+        started = time.perf_counter()
+        new_ranks = matrix.step(ranks, damping_factor)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if trace is not None:
+            trace.append((time.perf_counter() - started, residual))
+        if residual < tolerance:
+            break
+    return ranks
+
+
+def personalized_pagerank(matrix, damping_factor, teleports, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Return a matrix of personalized PageRank vectors, one column for
+    each column of `teleports`, solving them all in the same iteration.
+
+    With probability `1 - damping_factor` a surfer jumps to a page
+    drawn from its own teleport distribution instead of a uniform one.
+    Pages without links still lead to every page, as in `transition_model`.
+    Teleport weights must be non-negative with a positive total in
+    every column.
+    """
+    if (teleports < 0).any():
+        raise ValueError("teleport weights must not be negative")
+    totals = teleports.sum(axis=0)
+    if (totals <= 0).any():
+        raise ValueError("every teleport distribution needs a positive total weight")
+    teleports = teleports / totals
+    ranks = teleports.copy()
+    for _ in range(max_iterations):
+        dangling = ranks[matrix.dangling].sum(axis=0)
+        new_ranks = (
+            (1 - damping_factor) * teleports
+            + damping_factor * (matrix.multiply(ranks) + dangling / matrix.size)
+        )
+        residual = np.abs(new_ranks - ranks).sum(axis=0).max()
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return ranks
+
+
+def topic_pagerank(matrix, damping_factor, topics, tolerance=TOLERANCE):
+    """
+    Return a list of PageRank dictionaries, one for each topic.
+
+    Each topic is a set of pages to teleport to uniformly, or a
+    dictionary mapping pages to teleport weights. Results are cached
+    on the matrix by teleport set, and all topics that are not cached
+    yet are solved together in one batch.
+    """
+    keys = []
+    for topic in topics:
+        weights = topic if isinstance(topic, dict) else dict.fromkeys(topic, 1)
+        keys.append((damping_factor, tolerance, frozenset(weights.items())))
+
+    missing = list(dict.fromkeys(key for key in keys if key not in matrix.cache))
+    if missing:
+        index = {page: i for i, page in enumerate(matrix.pages)}
+        teleports = np.zeros((matrix.size, len(missing)))
+        for column, (_, _, weights) in enumerate(missing):
+            for page, weight in weights:
+                teleports[index[page], column] = weight
+        ranks = personalized_pagerank(matrix, damping_factor, teleports, tolerance)
+        for column, key in enumerate(missing):
+            matrix.cache[key] = dict(zip(matrix.pages, ranks[:, column].tolist()))
+
+    return [matrix.cache[key] for key in keys]
+
+
+def parallel_pagerank(matrix, damping_factor, tolerance=TOLERANCE,
+                      processes=None, gauss_seidel=False, trace=None,
+                      max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a LinkMatrix, updating blocks of
+    pages in a pool of processes that share the rank vectors, until
+    a sweep changes them by less than `tolerance` or after
+    `max_iterations` sweeps.
+
+    With `gauss_seidel`, each block is updated in place in slices of
+    SLICE pages, so later slices already use the new ranks of earlier
+    ones, which usually needs fewer sweeps than plain power iteration.
+    If `trace` is a list, (seconds, residual) is appended to it after
+    every sweep.
+    """
+    processes = processes or os.cpu_count()
+    blocks = split_blocks(matrix, processes * BLOCKS_PER_PROCESS)
+
+    arrays = {
+        "indptr": matrix.indptr,
+        "sources": matrix.sources,
+        "weights": matrix.weights,
+        "current": np.full(matrix.size, 1 / matrix.size),
+        "next": np.zeros(matrix.size)
+    }
+    memory = {}
+    try:
+        for name, values in arrays.items():
+            memory[name] = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            np.ndarray(values.shape, values.dtype, memory[name].buf)[:] = values
+        descriptors = {
+            name: (memory[name].name, values.shape, values.dtype.str)
+            for name, values in arrays.items()
+        }
+        ranks = {
+            name: np.ndarray(arrays[name].shape, np.float64, memory[name].buf)
+            for name in ["current", "next"]
+        }
+
+        with multiprocessing.Pool(
+            processes, initializer=init_solver,
+            initargs=(descriptors, damping_factor, matrix.size)
+        ) as pool:
+            read, write = "current", "current" if gauss_seidel else "next"
+            for _ in range(max_iterations):
+                started = time.perf_counter()
+                dangling = ranks[read][matrix.dangling].sum()
+                tasks = [(start, end, read, write, dangling) for start, end in blocks]
+                residual = sum(pool.map(solve_block, tasks))
+                if not gauss_seidel:
+                    read, write = write, read
+
+                # In place updates do not keep the total at 1, so rescale it
+                ranks[read] /= ranks[read].sum()
+                if trace is not None:
+                    trace.append((time.perf_counter() - started, residual))
+                if residual < tolerance:
+                    break
+
+            result = ranks[read].copy()
+            del ranks
+    finally:
+        for block in memory.values():
+            block.close()
+            block.unlink()
+    return result
+
+
+def split_blocks(matrix, count):
+    """
+    Split pages into up to `count` contiguous (start, end) blocks
+    holding roughly the same number of incoming links each.
+    """
+    cuts = np.searchsorted(
+        matrix.indptr, np.linspace(0, matrix.indptr[-1], count + 1)[1:-1]
+    )
+    bounds = np.unique(np.concatenate([[0], cuts, [matrix.size]]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def init_solver(descriptors, damping_factor, size):
+    """
+    Attach a solver process to the shared graph and rank arrays.
+    """
+    global solver
+    memory = {
+        name: shared_memory.SharedMemory(name=memory_name)
+        for name, (memory_name, shape, dtype) in descriptors.items()
+    }
+    solver = {
+        name: np.ndarray(shape, np.dtype(dtype), memory[name].buf)
+        for name, (memory_name, shape, dtype) in descriptors.items()
+    }
+    solver["memory"] = memory
+    solver["damping"] = damping_factor
+    solver["size"] = size
+
+
+def solve_block(task):
+    """
+    Update the ranks of pages `start` to `end` from the `read` rank
+    vector into the `write` one, returning their L1 change.
+    """
+    start, end, read, write, dangling = task
+    indptr, sources, weights = solver["indptr"], solver["sources"], solver["weights"]
+    damping_factor, size = solver["damping"], solver["size"]
+    base = (1 - damping_factor) / size + damping_factor * dangling / size
+
+    residual = 0
+    for low in range(start, end, SLICE):
+        high = min(end, low + SLICE)
+        first, last = indptr[low], indptr[high]
+        flow = solver[read][sources[first:last]] * weights[first:last]
+
+        # Segment sums by target page using the CSR row pointers
+        totals = np.zeros(len(flow) + 1)
+        np.cumsum(flow, out=totals[1:])
+        rows = indptr[low:high + 1] - first
+        new_ranks = base + damping_factor * (totals[rows[1:]] - totals[rows[:-1]])
+
+        residual += np.abs(new_ranks - solver[read][low:high]).sum()
+        solver[write][low:high] = new_ranks
+    return residual
+
+
+def matrix_sample_pagerank(matrix, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Return the PageRank vector of a LinkMatrix estimated from `n`
+    samples, taken by advancing many random surfers side by side.
+
+    Links out of a page are equally likely, so each page's outgoing
+    CSR slice acts as its alias table: a uniform offset into it picks
+    a link in constant time.
+    """
+    rng = np.random.default_rng(seed)
+    indptr, links = matrix.out_links()
+
+    def advance(current):
+        """Returns the next page for each surfer in `current`."""
+        # Teleport by default, follow a link with probability `damping_factor`
+        following = (rng.random(len(current)) < damping_factor) & ~matrix.dangling[current]
+        upcoming = rng.integers(matrix.size, size=len(current))
+        pages = current[following]
+        offsets = (rng.random(len(pages)) * matrix.out_degree[pages]).astype(np.int64)
+        upcoming[following] = links[indptr[pages] + offsets]
+        return upcoming
+
+    # Start every surfer on a random page and let it forget where it started,
+    # with no more surfers than leaves each one BURN_IN counted steps
+    position = rng.integers(matrix.size, size=max(1, min(walkers, n // BURN_IN)))
+    for _ in range(BURN_IN):
+        position = advance(position)
+
+    counts = np.zeros(matrix.size, dtype=np.int64)
+    samples = 0
+    while samples < n:
+        position[:n - samples] = advance(position[:n - samples])
+        counts += np.bincount(position[:n - samples], minlength=matrix.size)
+        samples += min(len(position), n - samples)
+
+    return counts / n
+
+
+def vector_sample_pagerank(corpus, damping_factor, n, walkers=WALKERS):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    many random surfers advanced together.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks = matrix_sample_pagerank(matrix, damping_factor, n, walkers)
+    return dict(zip(matrix.pages, ranks.tolist()))
+
+
+def power_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page by sparse power iteration.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks = matrix_pagerank(matrix, damping_factor, tolerance)
+    return dict(zip(matrix.pages, ranks.tolist()))
+
+
+def apply_diff(corpus, diff):
+    """
+    Return a copy of `corpus` with a diff applied.
+
+    `diff` maps each added or changed page to its new set of links,
+    and each removed page to None. Links to pages that are not in
+    the resulting corpus are dropped, as in `crawl`.
+    """
+    pages = {page: set(links) for page, links in corpus.items()}
+    for page, links in diff.items():
+        if links is None:
+            pages.pop(page, None)
+        else:
+            pages[page] = set(links) - {page}
+    for page in pages:
+        pages[page] = set(link for link in pages[page] if link in pages)
+    return pages
+
+
+def incremental_pagerank(corpus, ranks, diff, damping_factor, tolerance=TOLERANCE):
+    """
+    Return the corpus after applying `diff` and its PageRank values,
+    warm-starting from the previous `ranks` of `corpus`.
+
+    Pages that kept their rank start close to their new value, so
+    only the change introduced by the diff has to converge again.
+    """
+    corpus = apply_diff(corpus, diff)
+    return corpus, warm_pagerank(corpus, ranks, damping_factor, tolerance)
+
+
+def warm_pagerank(corpus, ranks, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page of `corpus`, starting
+    power iteration from previous `ranks` of an older version of it.
+
+    Pages without a previous rank start at 1 / N.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    initial = np.array([ranks.get(page, 1 / matrix.size) for page in matrix.pages])
+    ranks = matrix_pagerank(matrix, damping_factor, tolerance, initial)
+    return dict(zip(matrix.pages, ranks.tolist()))
+
+
+def save_ranks(filename, ranks):
+    """
+    Write PageRank values to a JSON file.
+    """
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(ranks, f, indent=1, sort_keys=True)
+
+
+def load_ranks(filename):
+    """
+    Read PageRank values written by `save_ranks`.
+    """
+    with open(filename, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def refresh_pagerank(corpus, filename, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for `corpus`, warm-starting from the ranks
+    saved in `filename` by the previous refresh if there are any, and
+    save the new ranks there for the next one.
+    """
+    if os.path.exists(filename):
+        ranks = warm_pagerank(corpus, load_ranks(filename), damping_factor, tolerance)
+    else:
+        ranks = power_pagerank(corpus, damping_factor, tolerance)
+    save_ranks(filename, ranks)
+    return ranks
+
+
+def write_edge_file(corpus, filename):
+    """
+    Write a corpus as a binary edge file of int32 (source, target)
+    page index pairs sorted by source, with the page names one per
+    line in `filename + ".pages"`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    with open(f"{filename}.pages", "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(f"{page}\n")
+    with open(filename, "wb") as f:
+        for page in pages:
+            targets = sorted(index[link] for link in corpus[page])
+            edges = np.empty((len(targets), 2), dtype=np.int32)
+            edges[:, 0] = index[page]
+            edges[:, 1] = targets
+            f.write(edges.tobytes())
+
+
+def convert_edges(edges_file, filename):
+    """
+    Convert a text edge file written by `crawl_parallel` into a
+    binary edge file, streaming it without building the corpus.
+    """
+    index = {}
+    with open(edges_file, encoding="utf-8") as f, \
+            open(f"{filename}.pages", "w", encoding="utf-8") as pages:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 1 and fields[0] not in index:
+                index[fields[0]] = len(index)
+                pages.write(f"{fields[0]}\n")
+
+    # Pages come before their own links, so edges are already sorted by source
+    with open(edges_file, encoding="utf-8") as f, open(filename, "wb") as out:
+        buffer = []
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 2:
+                buffer.append((index[fields[0]], index[fields[1]]))
+            if len(buffer) == CHUNK:
+                out.write(np.array(buffer, dtype=np.int32).tobytes())
+                buffer = []
+        out.write(np.array(buffer, dtype=np.int32).reshape(-1, 2).tobytes())
+
+
+def memmap_pagerank(filename, damping_factor, tolerance=TOLERANCE, trace=None,
+                    max_iterations=MAX_ITERATIONS):
+    """
+    Return the pages of a binary edge file and their PageRank vector,
+    streaming the memory-mapped edges once per iteration until
+    successive vectors are within `tolerance` in L1, or after
+    `max_iterations`.
+
+    Besides the out-degree of each page only two rank vectors are kept
+    in memory. If `trace` is a list, (seconds, residual) is appended to
+    it after every iteration.
+    """
+    with open(f"{filename}.pages", encoding="utf-8") as f:
+        pages = [line.rstrip("\n") for line in f]
+    size = len(pages)
+    if os.path.getsize(filename):
+        edges = np.memmap(filename, dtype=np.int32, mode="r").reshape(-1, 2)
+    else:
+        edges = np.zeros((0, 2), dtype=np.int32)
+
+    out_degree = np.zeros(size, dtype=np.int32)
+    for start in range(0, len(edges), CHUNK):
+        np.add.at(out_degree, edges[start:start + CHUNK, 0], 1)
+
+    ranks = np.full(size, 1 / size)
+    new_ranks = np.zeros(size)
+    for _ in range(max_iterations):
+        started = time.perf_counter()
+        for start in range(0, len(edges), CHUNK):
+            chunk = np.asarray(edges[start:start + CHUNK])
+            sources = chunk[:, 0]
+            np.add.at(new_ranks, chunk[:, 1], ranks[sources] / out_degree[sources])
+
+        # Pages without links are treated as linking to every page
+        dangling = ranks[out_degree == 0].sum()
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor) / size + damping_factor * dangling / size
+
+        # Measure the change in place, then reuse the old vector as the next buffer
+        ranks -= new_ranks
+        residual = np.abs(ranks, out=ranks).sum()
+        ranks, new_ranks = new_ranks, ranks
+        new_ranks.fill(0)
+
+        if trace is not None:
+            trace.append((time.perf_counter() - started, residual))
+        if residual < tolerance:
+            break
+    return pages, ranks
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python matrix.py corpus|edges")
+
+    # A binary edge file is ranked out of core
+    if os.path.isfile(sys.argv[1]):
+        trace = []
+        pages, ranks = memmap_pagerank(sys.argv[1], DAMPING, trace=trace)
+        for i, (seconds, residual) in enumerate(trace):
+            print(f"  Iteration {i + 1}: {seconds:.3f}s, residual {residual:.2e}")
+        print(f"PageRank Results from Out-of-Core Iteration")
+        for page, rank in sorted(zip(pages, ranks)):
+            print(f"  {page}: {rank:.4f}")
+        return
+
+    corpus = crawl(sys.argv[1])
+    ranks = vector_sample_pagerank(corpus, DAMPING, SAMPLES)
+    print(f"PageRank Results from Vectorized Sampling (n = {SAMPLES})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+    ranks = power_pagerank(corpus, DAMPING)
+    print(f"PageRank Results from Sparse Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
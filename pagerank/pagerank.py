@@ -1,12 +1,21 @@
+import multiprocessing
 import os
+import posixpath
 import random
 import re
 import sys
+import time
 from math import isclose
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Number of files handed to a crawler process at a time
+CHUNKSIZE = 256
+
+# Directory and pages of the corpus being crawled, set in each crawler process
+crawler_corpus = None
+
 
 def main():
     if len(sys.argv) != 2:
@@ -49,6 +58,73 @@ def crawl(directory):
     return pages
 
 
+def crawl_parallel(directory, edges_file, processes=None):
+    """
+    Parse every HTML page under `directory`, including subdirectories,
+    with a pool of processes and stream the links to `edges_file`.
+
+    Pages are named by their path relative to `directory`. Each page is
+    written as a line with its name, followed by one tab-separated
+    `page, link` line per link to another page in the corpus, so only
+    one page per process is ever held in memory.
+    """
+    pages = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.endswith(".html"):
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                pages.append(path.replace(os.sep, "/"))
+
+    with multiprocessing.Pool(
+        processes, initializer=init_crawler, initargs=(directory, set(pages))
+    ) as pool, open(edges_file, "w", encoding="utf-8") as f:
+        for page, links in pool.imap_unordered(extract_links, pages, CHUNKSIZE):
+            f.write(f"{page}\n")
+            for link in sorted(links):
+                f.write(f"{page}\t{link}\n")
+
+
+def init_crawler(directory, pages):
+    """
+    Remember the corpus being crawled in a crawler process.
+    """
+    global crawler_corpus
+    crawler_corpus = (directory, pages)
+
+
+def extract_links(page):
+    """
+    Return `page` and the set of other corpus pages it links to,
+    resolving links relative to the page's own directory.
+    """
+    directory, pages = crawler_corpus
+    with open(os.path.join(directory, page)) as f:
+        contents = f.read()
+    links = set()
+    for link in re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents):
+        link = posixpath.normpath(posixpath.join(posixpath.dirname(page), link))
+        if link in pages and link != page:
+            links.add(link)
+    return page, links
+
+
+def load_edges(edges_file):
+    """
+    Read an edge file written by `crawl_parallel` into a dictionary
+    in the same format as `crawl` returns.
+    """
+    pages = dict()
+    with open(edges_file, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 1:
+                pages.setdefault(fields[0], set())
+            else:
+                pages.setdefault(fields[0], set()).add(fields[1])
+    return pages
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -110,11 +186,14 @@ def sample_pagerank(corpus, damping_factor, n):
 
     return pagerank
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, trace=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    If `trace` is a list, (seconds, residual) is appended to it after
+    every iteration, where residual is the L1 change in PageRank.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
@@ -129,6 +208,8 @@ def iterate_pagerank(corpus, damping_factor):
     repeat = True
 
     while repeat:
+        started = time.perf_counter()
+
         # Calculate new rank values based on all of the current rank values
         for page in pagerank:
             total = float(0)
@@ -144,6 +225,9 @@ def iterate_pagerank(corpus, damping_factor):
             new_pagerank[page] = (1 - damping_factor) / len(corpus) + damping_factor * total
 
         repeat = False
+        if trace is not None:
+            residual = sum(abs(new_pagerank[page] - pagerank[page]) for page in pagerank)
+            trace.append((time.perf_counter() - started, residual))
 
         # if the value of pagerank is far from threshold repeat the process
         for page in pagerank: